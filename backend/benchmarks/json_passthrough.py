@@ -0,0 +1,79 @@
+"""
+Microbenchmark: CPU spent on Ollama JSON per request, before and after passthrough.
+
+Run from the backend directory:
+
+    python -m benchmarks.json_passthrough
+"""
+import json
+import timeit
+import warnings
+
+import httpx
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+from models import ChatRequest
+from ollama_client import passthrough
+
+ROUNDS = 2000
+
+
+def ollama_reply(context_tokens: int = 2048) -> bytes:
+    """A non-streaming /api/generate reply; ``context`` dominates its size"""
+    return json.dumps({
+        "model": "llama3",
+        "created_at": "2024-01-01T00:00:00.000000Z",
+        "response": "Lorem ipsum dolor sit amet. " * 80,
+        "done": True,
+        "context": list(range(context_tokens)),
+        "total_duration": 5043500667,
+        "load_duration": 5025959,
+        "prompt_eval_count": 26,
+        "prompt_eval_duration": 325953000,
+        "eval_count": 290,
+        "eval_duration": 4709213000,
+    }).encode("utf-8")
+
+
+def chat_request(turns: int = 20) -> ChatRequest:
+    return ChatRequest(
+        model="llama3",
+        messages=[
+            {"role": "user" if i % 2 == 0 else "assistant", "content": "Tell me more about that. " * 20}
+            for i in range(turns)
+        ],
+        temperature=0.7,
+    )
+
+
+def per_call_us(fn) -> float:
+    return min(timeit.repeat(fn, number=ROUNDS, repeat=5)) / ROUNDS * 1e6
+
+
+def main() -> None:
+    # ChatRequest.dict() is deprecated but is what the handlers used to call
+    warnings.filterwarnings("ignore", category=DeprecationWarning)
+    upstream = httpx.Response(200, content=ollama_reply(), headers={"content-type": "application/json"})
+    request = chat_request()
+
+    results = {
+        # Outbound: what FastAPI did with the dict returned by response.json()
+        "parse + jsonable_encoder + JSONResponse": lambda: JSONResponse(jsonable_encoder(upstream.json())),
+        "parse + jsonable_encoder + ORJSONResponse": lambda: ORJSONResponse(jsonable_encoder(upstream.json())),
+        "passthrough": lambda: passthrough(upstream),
+        # Inbound: building the body sent to Ollama
+        "dict() + json.dumps": lambda: json.dumps(request.dict(exclude_none=True)).encode("utf-8"),
+        "model_dump_json": lambda: request.model_dump_json(exclude_none=True).encode("utf-8"),
+        # JSON the backend builds itself
+        "JSONResponse (small dict)": lambda: JSONResponse({"detail": "Internal server error"}),
+        "ORJSONResponse (small dict)": lambda: ORJSONResponse({"detail": "Internal server error"}),
+    }
+
+    print(f"Ollama reply: {len(upstream.content)} bytes, chat request: {len(request.messages)} messages")
+    for name, fn in results.items():
+        print(f"{name:<45} {per_call_us(fn):9.1f} us/request")
+
+
+if __name__ == "__main__":
+    main()
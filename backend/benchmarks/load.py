@@ -0,0 +1,409 @@
+"""
+Offline load benchmark for the chat, generate, TTS and voice WebSocket paths.
+
+Starts a mock Ollama (``benchmarks.mock_ollama``) and the backend with a fake
+edge-tts (``benchmarks.offline_backend``) as subprocesses, drives each
+scenario at every concurrency level and reports latency percentiles, time
+to first token, throughput and the backend's resident memory. Nothing leaves
+the machine, so runs are comparable from one commit to the next.
+
+Run from the backend directory:
+
+    python -m benchmarks.load --save-baseline main
+    python -m benchmarks.load --compare main
+
+``--compare`` exits with status 1 when a metric is worse than the saved
+baseline by more than ``--tolerance``.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import httpx
+import websockets
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+BASELINE_DIR = Path(__file__).with_name("baselines")
+
+SCENARIOS = ["chat", "generate_stream", "tts", "ws_voice"]
+MODEL = "llama3:8b"
+
+# Latency changes smaller than this are noise, whatever the ratio
+MIN_LATENCY_DELTA_MS = 2.0
+
+
+@dataclass
+class Sample:
+    latency: float
+    ttft: Optional[float] = None
+    error: Optional[str] = None
+
+
+# One request of a scenario: ``run(client, worker, index)`` returns its sample
+Scenario = Callable[[httpx.AsyncClient, int, int], Awaitable[Sample]]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(values: List[float], p: float) -> Optional[float]:
+    """Linear-interpolated percentile of ``values`` (0 < p < 100)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * p / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def rss_bytes(pid: int) -> Optional[int]:
+    """Resident memory of ``pid``; None where /proc is not available"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def prompt(index: int) -> str:
+    # Distinct per request, so neither the response cache nor the TTS cache answers
+    return f"Benchmark request {index}: tell me something about the number {index}."
+
+
+async def chat(client: httpx.AsyncClient, worker: int, index: int) -> Sample:
+    start = time.perf_counter()
+    response = await client.post("/api/chat", json={
+        "model": MODEL,
+        "messages": [{"role": "user", "content": prompt(index)}],
+    })
+    latency = time.perf_counter() - start
+    if response.status_code != 200:
+        return Sample(latency, error=str(response.status_code))
+    return Sample(latency)
+
+
+async def generate_stream(client: httpx.AsyncClient, worker: int, index: int) -> Sample:
+    start = time.perf_counter()
+    ttft = None
+    async with client.stream("POST", "/api/generate", json={
+        "model": MODEL,
+        "messages": [{"role": "user", "content": prompt(index)}],
+        "stream": True,
+    }) as response:
+        if response.status_code != 200:
+            await response.aread()
+            return Sample(time.perf_counter() - start, error=str(response.status_code))
+        async for line in response.aiter_lines():
+            if not line.startswith("data: "):
+                continue
+            data = json.loads(line[len("data: "):])
+            if "error" in data:
+                return Sample(time.perf_counter() - start, ttft, error=data["error"])
+            if ttft is None and data.get("response"):
+                ttft = time.perf_counter() - start
+    return Sample(time.perf_counter() - start, ttft)
+
+
+async def tts(client: httpx.AsyncClient, worker: int, index: int) -> Sample:
+    start = time.perf_counter()
+    ttft = None
+    async with client.stream("POST", "/api/tts", json={"text": prompt(index)}) as response:
+        async for chunk in response.aiter_bytes():
+            if ttft is None and chunk:
+                ttft = time.perf_counter() - start
+        if response.status_code != 200:
+            return Sample(time.perf_counter() - start, error=str(response.status_code))
+    return Sample(time.perf_counter() - start, ttft)
+
+
+async def ws_voice(client: httpx.AsyncClient, worker: int, index: int) -> Sample:
+    """One spoken chat turn; TTFT here is the time to the first audio chunk"""
+    url = str(client.base_url).replace("http", "ws", 1) + f"/ws/voice/bench-{worker}-{index}"
+    start = time.perf_counter()
+    ttft = None
+    async with websockets.connect(url, max_size=None) as ws:
+        await ws.send(json.dumps({
+            "type": "chat",
+            "model": MODEL,
+            "messages": [{"role": "user", "content": prompt(index)}],
+        }))
+        async for message in ws:
+            if isinstance(message, bytes):
+                if ttft is None:
+                    ttft = time.perf_counter() - start
+                continue
+            data = json.loads(message)
+            if data.get("type") == "error":
+                return Sample(time.perf_counter() - start, ttft, error=data.get("message"))
+            if data.get("type") == "done":
+                break
+    return Sample(time.perf_counter() - start, ttft)
+
+
+SCENARIO_RUNNERS: Dict[str, Scenario] = {
+    "chat": chat,
+    "generate_stream": generate_stream,
+    "tts": tts,
+    "ws_voice": ws_voice,
+}
+
+
+async def run_level(
+    base_url: str,
+    scenario: Scenario,
+    concurrency: int,
+    requests: int,
+    backend_pid: Optional[int],
+    first_index: int
+) -> Dict[str, Any]:
+    """Send ``requests`` requests from ``concurrency`` workers and summarize them"""
+    samples: List[Sample] = []
+    next_index = iter(range(first_index, first_index + requests))
+    peak_rss = rss_bytes(backend_pid) if backend_pid else None
+
+    async def worker(worker_id: int, client: httpx.AsyncClient) -> None:
+        for index in next_index:
+            try:
+                samples.append(await scenario(client, worker_id, index))
+            except (httpx.HTTPError, websockets.WebSocketException, OSError) as e:
+                samples.append(Sample(0.0, error=type(e).__name__))
+
+    async def sample_rss() -> None:
+        nonlocal peak_rss
+        while True:
+            await asyncio.sleep(0.1)
+            rss = rss_bytes(backend_pid)
+            if rss is not None and (peak_rss is None or rss > peak_rss):
+                peak_rss = rss
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60.0) as client:
+        sampler = asyncio.create_task(sample_rss()) if backend_pid else None
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(i, client) for i in range(concurrency)))
+        elapsed = time.perf_counter() - start
+        if sampler is not None:
+            sampler.cancel()
+
+    ok = [s for s in samples if s.error is None]
+    latencies = [s.latency * 1000 for s in ok]
+    ttfts = [s.ttft * 1000 for s in ok if s.ttft is not None]
+    errors: Dict[str, int] = {}
+    for s in samples:
+        if s.error is not None:
+            errors[s.error] = errors.get(s.error, 0) + 1
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "ttft_p50_ms": percentile(ttfts, 50),
+        "ttft_p95_ms": percentile(ttfts, 95),
+        "throughput_rps": len(ok) / elapsed if elapsed else None,
+        "rss_end_mb": rss_bytes(backend_pid) / 2 ** 20 if backend_pid and rss_bytes(backend_pid) else None,
+        "rss_peak_mb": peak_rss / 2 ** 20 if peak_rss else None,
+    }
+
+
+def start_servers(args: argparse.Namespace, workdir: str) -> List[subprocess.Popen]:
+    """Start the mock Ollama and the backend; returns [mock, backend]"""
+    ollama_port = free_port()
+    mock = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.mock_ollama", "--port", str(ollama_port),
+         "--ttft", str(args.ttft), "--token-interval", str(args.token_interval), "--tokens", str(args.tokens)],
+        cwd=BACKEND_DIR
+    )
+    max_concurrency = max(args.concurrency)
+    env = {
+        **os.environ,
+        "OLLAMA_BASE_URL": f"http://127.0.0.1:{ollama_port}",
+        "LOG_LEVEL": "WARNING",
+        "LOG_FILE": "",
+        # The mock has no capacity limit; measure the backend, not its admission control
+        "RATE_LIMIT": "1000000/minute",
+        "SCHEDULER_MAX_CONCURRENCY_PER_MODEL": str(max_concurrency),
+        "SCHEDULER_MAX_QUEUE_DEPTH": str(max_concurrency * 4),
+        "SCHEDULER_MAX_QUEUE_PER_CLIENT": str(max_concurrency * 4),
+        "WS_MAX_UTTERANCES_PER_CLIENT": "4",
+        "CONVERSATION_DB_PATH": os.path.join(workdir, "conversations.db"),
+        "SHARED_STATE_PATH": os.path.join(workdir, "shared_state.db"),
+        "TTS_CACHE_DIR": os.path.join(workdir, "tts"),
+    }
+    backend = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.offline_backend", "--port", str(args.port),
+         "--tts-first-chunk", str(args.tts_first_chunk)],
+        cwd=BACKEND_DIR,
+        env=env
+    )
+    return [mock, backend]
+
+
+async def wait_until_ready(base_url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get("/api/ready")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"Backend at {base_url} did not become ready within {timeout:.0f}s")
+
+
+async def run_all(args: argparse.Namespace, base_url: str, backend_pid: Optional[int]) -> Dict[str, Any]:
+    await wait_until_ready(base_url)
+    results: Dict[str, Any] = {}
+    index = 0
+    for name in args.scenarios:
+        scenario = SCENARIO_RUNNERS[name]
+        # Warm-up: connections, imports and the model catalogue
+        await run_level(base_url, scenario, 2, 4, None, index)
+        index += 4
+        results[name] = {}
+        for concurrency in args.concurrency:
+            results[name][str(concurrency)] = await run_level(
+                base_url, scenario, concurrency, args.requests, backend_pid, index
+            )
+            index += args.requests
+    return results
+
+
+def format_ms(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value:.1f}"
+
+
+def print_report(results: Dict[str, Any]) -> None:
+    columns = ["p50_ms", "p95_ms", "p99_ms", "ttft_p50_ms", "ttft_p95_ms", "throughput_rps", "rss_peak_mb"]
+    print(f"{'scenario':<16} {'conc':>4} {'errors':>6} " + " ".join(f"{c:>14}" for c in columns))
+    for name, levels in results.items():
+        for concurrency, result in levels.items():
+            errors = sum(result["errors"].values())
+            print(f"{name:<16} {concurrency:>4} {errors:>6} " + " ".join(f"{format_ms(result[c]):>14}" for c in columns))
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Describe every metric worse than ``baseline`` by more than ``tolerance``"""
+    regressions = []
+    lower_is_better = ["p50_ms", "p95_ms", "p99_ms", "ttft_p50_ms", "ttft_p95_ms", "rss_peak_mb"]
+    for name, levels in results.items():
+        for concurrency, result in levels.items():
+            before = baseline.get("results", {}).get(name, {}).get(concurrency)
+            if before is None:
+                continue
+            where = f"{name} @ {concurrency}"
+            for metric in lower_is_better:
+                old, new = before.get(metric), result.get(metric)
+                if old is None or new is None:
+                    continue
+                if metric.endswith("_ms") and new - old < MIN_LATENCY_DELTA_MS:
+                    continue
+                if new > old * (1 + tolerance):
+                    regressions.append(f"{where}: {metric} {old:.1f} -> {new:.1f}")
+            old, new = before.get("throughput_rps"), result.get("throughput_rps")
+            if old and new is not None and new < old * (1 - tolerance):
+                regressions.append(f"{where}: throughput_rps {old:.1f} -> {new:.1f}")
+            if sum(result["errors"].values()) > sum(before.get("errors", {}).values()):
+                regressions.append(f"{where}: errors {before.get('errors')} -> {result['errors']}")
+    return regressions
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Offline load benchmark for the Matou Chat backend")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        type=lambda value: [s for s in value.split(",") if s],
+                        help=f"comma-separated subset of {','.join(SCENARIOS)}")
+    parser.add_argument("--concurrency", default="1,8,32",
+                        type=lambda value: [int(c) for c in value.split(",")],
+                        help="comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario and level")
+    parser.add_argument("--url", help="benchmark a backend that is already running instead of starting one")
+    parser.add_argument("--pid", type=int, help="process id of the --url backend, to report its memory")
+    parser.add_argument("--port", type=int, default=0, help="port for the backend started here")
+    parser.add_argument("--ttft", type=float, default=0.05, help="mock Ollama delay before the first token")
+    parser.add_argument("--token-interval", type=float, default=0.01, help="mock Ollama delay between tokens")
+    parser.add_argument("--tokens", type=int, default=32, help="tokens per mock Ollama reply")
+    parser.add_argument("--tts-first-chunk", type=float, default=0.05, help="fake edge-tts delay before audio")
+    parser.add_argument("--output", help="also write the results as JSON to this file")
+    parser.add_argument("--save-baseline", metavar="NAME", help=f"save the results to {BASELINE_DIR.name}/NAME.json")
+    parser.add_argument("--compare", metavar="NAME", help="compare against a saved baseline")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed relative regression")
+    args = parser.parse_args(argv)
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    return args
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    servers: List[subprocess.Popen] = []
+    with tempfile.TemporaryDirectory(prefix="matou-bench-") as workdir:
+        try:
+            if args.url:
+                base_url, backend_pid = args.url.rstrip("/"), args.pid
+            else:
+                args.port = args.port or free_port()
+                servers = start_servers(args, workdir)
+                base_url, backend_pid = f"http://127.0.0.1:{args.port}", servers[1].pid
+            results = asyncio.run(run_all(args, base_url, backend_pid))
+        finally:
+            for server in reversed(servers):
+                server.terminate()
+                server.wait(timeout=10)
+
+    print_report(results)
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": {
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "ttft": args.ttft,
+            "token_interval": args.token_interval,
+            "tokens": args.tokens,
+            "tts_first_chunk": args.tts_first_chunk,
+        },
+        "results": results,
+    }
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2) + "\n")
+    if args.save_baseline:
+        BASELINE_DIR.mkdir(exist_ok=True)
+        path = BASELINE_DIR / f"{args.save_baseline}.json"
+        path.write_text(json.dumps(report, indent=2) + "\n")
+        print(f"Saved baseline to {path}")
+    if args.compare:
+        baseline = json.loads((BASELINE_DIR / f"{args.compare}.json").read_text())
+        if baseline.get("settings") != report["settings"]:
+            print("Warning: baseline was recorded with different settings")
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+        print(f"No regressions against {args.compare} (tolerance {args.tolerance:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+"""
+Stand-in for an Ollama server, for benchmarks that must not depend on a GPU.
+
+Replies to /api/chat and /api/generate are token streams with a fixed delay
+before the first token and between tokens, so the backend sees the same
+timing on every run. Non-streaming calls wait for the whole simulated reply.
+
+Run from the backend directory:
+
+    python -m benchmarks.mock_ollama --port 11500 --ttft 0.05 --token-interval 0.01
+"""
+import argparse
+import asyncio
+import json
+import time
+from typing import Any, AsyncGenerator, Dict, List
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import Response, StreamingResponse
+
+MODELS = ["llama3:8b", "gemma2:2b"]
+
+
+def model_entry(name: str) -> Dict[str, Any]:
+    return {
+        "name": name,
+        "model": name,
+        "modified_at": "2024-01-01T00:00:00Z",
+        "size": 4_700_000_000,
+        "digest": "0" * 64,
+        "details": {"format": "gguf", "family": name.split(":")[0], "parameter_size": "8.0B", "quantization_level": "Q4_0"},
+    }
+
+
+def create_app(ttft: float = 0.05, token_interval: float = 0.01, tokens: int = 32) -> FastAPI:
+    """
+    An app answering like Ollama after ``ttft`` seconds, then one token
+    every ``token_interval`` seconds, ``tokens`` tokens per reply.
+    """
+    app = FastAPI()
+    app.state.requests = 0
+
+    def line(path: str, model: str, content: str, done: bool) -> bytes:
+        data: Dict[str, Any] = {"model": model, "created_at": "2024-01-01T00:00:00Z", "done": done}
+        if path == "/api/chat":
+            data["message"] = {"role": "assistant", "content": content}
+        else:
+            data["response"] = content
+        if done:
+            data.update({
+                "done_reason": "stop",
+                "total_duration": int((ttft + tokens * token_interval) * 1e9),
+                "eval_count": tokens,
+                "eval_duration": int(max(tokens * token_interval, 1e-3) * 1e9),
+            })
+        return json.dumps(data).encode("utf-8") + b"\n"
+
+    def words(count: int) -> List[str]:
+        # Full stops every eight words give the voice pipeline sentences to speak
+        return [f"word{i}{'.' if i % 8 == 7 else ''} " for i in range(count)]
+
+    async def reply_stream(path: str, model: str) -> AsyncGenerator[bytes, None]:
+        await asyncio.sleep(ttft)
+        for i, word in enumerate(words(tokens)):
+            if i:
+                await asyncio.sleep(token_interval)
+            yield line(path, model, word, False)
+        yield line(path, model, "", True)
+
+    async def reply(request: Request) -> Response:
+        app.state.requests += 1
+        body = await request.json()
+        model = body.get("model", MODELS[0])
+        path = request.url.path
+        if path == "/api/generate" and not body.get("prompt") and not body.get("messages"):
+            # A load request (model and keep_alive only)
+            return Response(line(path, model, "", True), media_type="application/json")
+        if body.get("stream", True):
+            return StreamingResponse(reply_stream(path, model), media_type="application/x-ndjson")
+        await asyncio.sleep(ttft + max(tokens - 1, 0) * token_interval)
+        data = json.loads(line(path, model, "".join(words(tokens)), True))
+        return Response(json.dumps(data).encode("utf-8"), media_type="application/json")
+
+    app.add_api_route("/api/chat", reply, methods=["POST"])
+    app.add_api_route("/api/generate", reply, methods=["POST"])
+
+    @app.get("/api/tags")
+    async def tags():
+        return {"models": [model_entry(name) for name in MODELS]}
+
+    @app.get("/api/ps")
+    async def ps():
+        expires = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(time.time() + 300))
+        return {"models": [{**model_entry(name), "expires_at": expires} for name in MODELS]}
+
+    @app.get("/api/version")
+    async def version():
+        return {"version": "0.0.0-mock"}
+
+    @app.get("/mock/stats")
+    async def stats():
+        return {"requests": app.state.requests}
+
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve a mock Ollama API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11500)
+    parser.add_argument("--ttft", type=float, default=0.05, help="seconds before the first token")
+    parser.add_argument("--token-interval", type=float, default=0.01, help="seconds between tokens")
+    parser.add_argument("--tokens", type=int, default=32, help="tokens per reply")
+    args = parser.parse_args()
+    uvicorn.run(
+        create_app(args.ttft, args.token_interval, args.tokens),
+        host=args.host,
+        port=args.port,
+        log_level="warning"
+    )
+
+
+if __name__ == "__main__":
+    main()
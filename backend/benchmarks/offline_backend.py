@@ -0,0 +1,79 @@
+"""
+Run the backend with edge-tts replaced by a local fake, for benchmarks.
+
+The fake produces MP3-sized chunks of silence-like bytes after a fixed
+first-chunk delay, so /api/tts and the voice WebSocket can be measured
+without reaching the Microsoft service. Everything else is the real app;
+point it at a mock Ollama through OLLAMA_BASE_URL.
+
+Run from the backend directory:
+
+    OLLAMA_BASE_URL=http://127.0.0.1:11500 python -m benchmarks.offline_backend --port 8100
+"""
+import argparse
+import asyncio
+import json
+from typing import Any, AsyncGenerator, Dict, List
+
+import edge_tts
+import uvicorn
+
+# Roughly what edge-tts returns: 48 kbit/s MP3 at ~15 characters of speech per second
+BYTES_PER_CHAR = 400
+CHUNK_SIZE = 4096
+
+
+class FakeCommunicate:
+    """Drop-in for ``edge_tts.Communicate`` that never touches the network"""
+
+    first_chunk_delay = 0.05
+    chunk_interval = 0.002
+
+    def __init__(self, text: str, voice: str = "en-US-AriaNeural", rate: str = "+0%", volume: str = "+0%", **kwargs: Any):
+        self.text = text
+        self.voice = voice
+
+    async def stream(self) -> AsyncGenerator[Dict[str, Any], None]:
+        size = max(len(self.text) * BYTES_PER_CHAR, CHUNK_SIZE)
+        await asyncio.sleep(self.first_chunk_delay)
+        for offset in range(0, size, CHUNK_SIZE):
+            if offset:
+                await asyncio.sleep(self.chunk_interval)
+            yield {"type": "audio", "data": bytes(min(CHUNK_SIZE, size - offset))}
+        yield {"type": "WordBoundary", "offset": 0, "duration": 0, "text": self.text}
+
+    async def save(self, path: str) -> None:
+        with open(path, "wb") as f:
+            async for message in self.stream():
+                if message["type"] == "audio":
+                    f.write(message["data"])
+
+
+async def fake_list_voices() -> List[Dict[str, Any]]:
+    from voice_catalog import SNAPSHOT_PATH
+    return json.loads(SNAPSHOT_PATH.read_text(encoding="utf-8"))
+
+
+def install(first_chunk_delay: float, chunk_interval: float) -> None:
+    """Swap the fake into ``edge_tts`` before the app makes its first call"""
+    FakeCommunicate.first_chunk_delay = first_chunk_delay
+    FakeCommunicate.chunk_interval = chunk_interval
+    edge_tts.Communicate = FakeCommunicate
+    edge_tts.list_voices = fake_list_voices
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run the backend with a fake edge-tts")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--tts-first-chunk", type=float, default=0.05, help="seconds before the first audio chunk")
+    parser.add_argument("--tts-chunk-interval", type=float, default=0.002, help="seconds between audio chunks")
+    args = parser.parse_args()
+
+    install(args.tts_first_chunk, args.tts_chunk_interval)
+    from main import app
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,11 @@
 from pydantic_settings import BaseSettings
-from typing import List, Optional
+from typing import Any, Dict, List, Optional, Union
 from functools import lru_cache
-import logging
+import json
 import os
-from pathlib import Path
+import traceback
 
-# Create logs directory if it doesn't exist
-Path("logs").mkdir(exist_ok=True)
+from loguru import logger
 
 class Settings(BaseSettings):
     # Application settings
@@ -18,6 +17,11 @@ class Settings(BaseSettings):
     HOST: str = "0.0.0.0"
     PORT: int = 8000
     RELOAD: bool = True
+    # Worker processes; each handles its own connections (WebSockets included) and
+    # the scheduler's per-model limits are split between them
+    WORKERS: int = 1
+    # State shared by the workers on this host (model catalogue, Ollama health)
+    SHARED_STATE_PATH: str = "data/shared_state.db"
     
     # CORS settings
     CORS_ORIGINS: List[str] = ["*"]
@@ -26,11 +30,93 @@ class Settings(BaseSettings):
     
     # Ollama settings
     OLLAMA_BASE_URL: str = "http://localhost:11434"
-    OLLAMA_TIMEOUT: int = 300  # 5 minutes
+    OLLAMA_CONNECT_TIMEOUT: float = 5.0  # seconds to open a connection
+    OLLAMA_FIRST_BYTE_TIMEOUT: float = 300.0  # model load + prompt evaluation
+    OLLAMA_INTER_TOKEN_TIMEOUT: float = 30.0  # max gap between streamed tokens
+    OLLAMA_MAX_CONNECTIONS: int = 100
+    OLLAMA_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    OLLAMA_KEEPALIVE_EXPIRY: float = 30.0  # seconds
+    OLLAMA_HTTP2: bool = False  # requires the h2 package
+    # Several Ollama servers to spread requests over; empty means just OLLAMA_BASE_URL.
+    # Scheduler limits apply to the whole pool, so raise them as nodes are added.
+    OLLAMA_BASE_URLS: List[str] = []
+    OLLAMA_PROBE_INTERVAL: float = 10.0  # seconds between node health probes
+    OLLAMA_MAX_NODE_FAILURES: int = 3  # consecutive failed calls before a node is ejected
+    OLLAMA_BREAKER_COOLDOWN: float = 5.0  # seconds an ejected node fails fast before a trial call
+    # Models loaded in the background at startup, so their first chat does not pay the load
+    OLLAMA_PRELOAD_MODELS: List[str] = []
+    # How long Ollama keeps a model in memory after a request ("10m", seconds, -1 = forever).
+    # Per-model entries match the full name or the name without its tag; None keeps Ollama's default.
+    OLLAMA_KEEP_ALIVE: Optional[Union[str, int]] = None
+    OLLAMA_MODEL_KEEP_ALIVE: Dict[str, Union[str, int]] = {}
     
-    # Rate limiting
+    # Response cache for deterministic (temperature 0) chat/generate calls
+    RESPONSE_CACHE_MAX_ENTRIES: int = 512
+    RESPONSE_CACHE_TTL: float = 600.0  # seconds
+    
+    # Batch chat (/api/chat/batch)
+    CHAT_BATCH_MAX_REQUESTS: int = 256
+    # Requests of one batch in flight; the scheduler's limits still apply, so keep it
+    # within SCHEDULER_MAX_QUEUE_PER_CLIENT or queued requests may be refused
+    CHAT_BATCH_CONCURRENCY: int = 4
+    
+    # Installed-model catalogue behind /api/tags
+    MODEL_CATALOG_TTL: float = 30.0  # seconds a fetched list is served as fresh
+    MODEL_CATALOG_MAX_STALE: float = 300.0  # further seconds served while refreshing
+    
+    # Server-side chat sessions
+    SESSION_IDLE_TIMEOUT: float = 30 * 60  # seconds before an idle session is dropped
+    SESSION_MAX_SESSIONS: int = 1000
+    SESSION_MAX_MESSAGES: int = 200  # history kept per session
+    SESSION_CONTEXT_TOKENS: int = 0  # prompt budget per turn, 0 sends the full history
+    
+    # Persistent conversation history (SQLite)
+    CONVERSATION_DB_PATH: str = "data/conversations.db"
+    CONVERSATION_WRITE_BATCH_SIZE: int = 256  # messages per transaction
+    CONVERSATION_FLUSH_INTERVAL: float = 0.5  # seconds writes wait to be batched
+    
+    # TTS audio cache
+    TTS_CACHE_MEMORY_BYTES: int = 64 * 1024 * 1024
+    TTS_CACHE_DIR: str = "cache/tts"
+    TTS_CACHE_DISK_BYTES: int = 512 * 1024 * 1024
+    TTS_CACHE_MAX_AGE: int = 60 * 60 * 24  # browser cache lifetime in seconds
+    
+    # Long-text TTS (/api/tts/long), synthesized sentence by sentence
+    TTS_LONG_MAX_CHARS: int = 100_000
+    TTS_SEGMENT_MAX_CHARS: int = 500  # longer sentences are cut at a word boundary
+    TTS_SEGMENT_CONCURRENCY: int = 4  # segments synthesized ahead of playback
+    
+    # edge-tts voice catalogue
+    TTS_VOICES_TTL: float = 86400.0  # seconds before the live voice list is fetched again
+    
+    # Voice pipeline (LLM -> TTS over the voice WebSocket)
+    VOICE_MAX_PARALLEL_TTS: int = 3  # sentences synthesized ahead of playback
+    VOICE_MIN_SENTENCE_CHARS: int = 20
+    
+    # Voice WebSocket connections
+    WS_SEND_QUEUE_SIZE: int = 64  # outbound messages buffered per client
+    WS_MAX_UTTERANCES_PER_CLIENT: int = 2
+    
+    # Logging
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "text"  # console output, "text" or "json"; the file is always JSON
+    LOG_FILE: str = "logs/app.log"
+    LOG_REQUEST_SAMPLE_RATE: float = 1.0  # share of access-log lines kept
+    LOG_ROUTE_SAMPLE_RATES: Dict[str, float] = {"/metrics": 0.0, "/api/health": 0.1, "/api/ready": 0.1}
+    LOG_ROUTE_LEVELS: Dict[str, str] = {}  # access-log level per route template
+    
+    # Rate limiting (counted per worker process)
     RATE_LIMIT: str = "100/minute"
     
+    # Ollama admission control; limits are for the whole host and split between WORKERS
+    SCHEDULER_MAX_CONCURRENCY_PER_MODEL: int = 2
+    SCHEDULER_MODEL_CONCURRENCY: Dict[str, int] = {}  # per-model overrides
+    SCHEDULER_MAX_QUEUE_DEPTH: int = 32  # queued requests per model
+    SCHEDULER_MAX_QUEUE_PER_CLIENT: int = 4
+    # Peers (e.g. a reverse proxy) whose X-Client-ID header is trusted to name the caller
+    # for rate limiting and fair queuing; everyone else is keyed on their address
+    TRUSTED_PROXIES: List[str] = []
+    
     # Security
     SECRET_KEY: str = "your-secret-key-here"  # Change this in production
     ALGORITHM: str = "HS256"
@@ -45,24 +131,59 @@ def get_settings() -> Settings:
     return Settings()
 
 # Configure logging
-def setup_logging():
+TEXT_FORMAT = "<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>"
+
+_logging_configured = False
+
+def json_format(record: Dict[str, Any]) -> str:
+    """Render a record as one JSON object per line; keyword arguments become fields"""
+    entry = {
+        "time": record["time"].isoformat(),
+        "level": record["level"].name,
+        "logger": record["name"],
+        "function": record["function"],
+        "line": record["line"],
+        "message": record["message"],
+    }
+    entry.update((key, value) for key, value in record["extra"].items() if not key.startswith("_"))
+    if record["exception"] is not None:
+        entry["exception"] = "".join(traceback.format_exception(*record["exception"]))
+    # Returned through extra so the braces in the JSON are not parsed as a format string
+    record["extra"]["_json"] = json.dumps(entry, default=str)
+    return "{extra[_json]}\n"
+
+def setup_logging(force: bool = False):
+    """
+    Configure the log sinks once; later calls are no-ops unless ``force`` is set.
+
+    Every sink is enqueued: the caller only formats the line, and a
+    background thread writes it, so a slow disk or terminal never stalls the
+    event loop.
+    """
+    global _logging_configured
+    if _logging_configured and not force:
+        return logger
+    
     import sys
-    from loguru import logger
+    settings = get_settings()
     
     logger.remove()
     logger.add(
         sys.stderr,
-        format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>"
-    )
-    logger.add(
-        "logs/app.log",
-        rotation="100 MB",
-        retention="30 days",
-        compression="zip",
-        enqueue=True,
-        level="INFO"
+        level=settings.LOG_LEVEL,
+        format=json_format if settings.LOG_FORMAT == "json" else TEXT_FORMAT,
+        enqueue=True
     )
+    if settings.LOG_FILE:
+        logger.add(
+            settings.LOG_FILE,
+            level=settings.LOG_LEVEL,
+            format=json_format,
+            rotation="100 MB",
+            retention="30 days",
+            compression="zip",
+            enqueue=True
+        )
     
+    _logging_configured = True
     return logger
-
-logger = setup_logging()
@@ -0,0 +1,283 @@
+import asyncio
+import base64
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from loguru import logger
+
+from config import get_settings
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversations (
+    id TEXT PRIMARY KEY,
+    title TEXT,
+    model TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS conversations_by_update ON conversations (updated_at DESC, id DESC);
+
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    conversation_id TEXT NOT NULL REFERENCES conversations (id),
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS messages_by_conversation ON messages (conversation_id, id);
+
+-- External-content index: the text is stored once, in messages
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5 (
+    content,
+    content = 'messages',
+    content_rowid = 'id'
+);
+-- Messages are append-only, so inserts are the only change to mirror
+CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+    INSERT INTO messages_fts (rowid, content) VALUES (new.id, new.content);
+END;
+"""
+
+TITLE_LENGTH = 80
+MAX_ROWID = 2 ** 63 - 1
+# Value types of each cursor's entries: (updated_at, id) and a message rowid
+CONVERSATION_CURSOR = ((int, float), (str,))
+MESSAGE_CURSOR = ((int,),)
+
+
+def encode_cursor(value: Any) -> str:
+    """Opaque pagination cursor for ``value`` (the sort key of the last row)"""
+    return base64.urlsafe_b64encode(json.dumps(value).encode("utf-8")).decode("ascii")
+
+
+def _has_types(value: Any, types: Tuple[type, ...]) -> bool:
+    # JSON true/false decode to bool, which is an int subclass
+    if not isinstance(value, types) or isinstance(value, bool):
+        return False
+    # SQLite integers are 64-bit; larger ones cannot even be bound
+    return not isinstance(value, int) or abs(value) <= MAX_ROWID
+
+
+def decode_cursor(cursor: str, shape: Tuple[Tuple[type, ...], ...]) -> Any:
+    """
+    Decode a cursor holding one value per entry of ``shape``, each of one of its types.
+
+    A single-entry shape decodes to the bare value, otherwise to a list.
+    Raises ``ValueError`` for cursors that were not produced by ``encode_cursor``.
+    """
+    try:
+        value = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (UnicodeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+    values = [value] if len(shape) == 1 else value
+    if not (
+        isinstance(values, list)
+        and len(values) == len(shape)
+        and all(_has_types(item, types) for item, types in zip(values, shape))
+    ):
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return value
+
+
+def fts_query(text: str) -> str:
+    """Quote every term so user input is never parsed as FTS5 syntax"""
+    return " ".join('"' + term.replace('"', '""') + '"' for term in text.split())
+
+
+class ConversationStore:
+    """
+    Persistent conversation history in SQLite.
+
+    The database runs in WAL mode so searches never wait on the writer.
+    Messages are only ever appended; callers hand them to ``record`` which
+    just queues them, and a background task commits the queue in batches on
+    a worker thread, keeping disk I/O off the request path. An FTS5 index
+    over message content backs ``search``.
+    """
+
+    def __init__(self, path: str, batch_size: int, flush_interval: float):
+        self.path = Path(path)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: "asyncio.Queue[Optional[Tuple]]" = asyncio.Queue()
+        self._writer: Optional[asyncio.Task] = None
+        self._write_conn: Optional[sqlite3.Connection] = None
+        self._read_conn: Optional[sqlite3.Connection] = None
+        # One statement at a time per connection; to_thread may use any thread
+        self._read_lock = threading.Lock()
+
+    async def start(self) -> None:
+        """Open the database and start the batch writer"""
+        await asyncio.to_thread(self._open)
+        self._writer = asyncio.create_task(self._write_batches())
+
+    async def close(self) -> None:
+        """Flush queued messages, then close the database"""
+        if self._writer is not None:
+            self._queue.put_nowait(None)
+            await self._writer
+            self._writer = None
+        for conn in (self._write_conn, self._read_conn):
+            if conn is not None:
+                conn.close()
+        self._write_conn = self._read_conn = None
+
+    def record(
+        self,
+        conversation_id: str,
+        model: str,
+        messages: Sequence[Dict[str, str]]
+    ) -> None:
+        """Queue messages for a conversation; never blocks"""
+        now = time.time()
+        for message in messages:
+            self._queue.put_nowait(
+                (conversation_id, model, message["role"], message["content"], now)
+            )
+
+    async def list_conversations(self, limit: int, cursor: Optional[str] = None) -> Dict[str, Any]:
+        """Most recently updated conversations first"""
+        if cursor:
+            updated_at, conversation_id = decode_cursor(cursor, CONVERSATION_CURSOR)
+            rows = await self._read(
+                "SELECT id, title, model, created_at, updated_at FROM conversations"
+                " WHERE (updated_at, id) < (?, ?)"
+                " ORDER BY updated_at DESC, id DESC LIMIT ?",
+                (updated_at, conversation_id, limit + 1)
+            )
+        else:
+            rows = await self._read(
+                "SELECT id, title, model, created_at, updated_at FROM conversations"
+                " ORDER BY updated_at DESC, id DESC LIMIT ?",
+                (limit + 1,)
+            )
+        page, next_cursor = self._paginate(rows, limit, lambda row: [row["updated_at"], row["id"]])
+        return {"conversations": page, "next_cursor": next_cursor}
+
+    async def list_messages(
+        self,
+        conversation_id: str,
+        limit: int,
+        cursor: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """A conversation's messages, oldest first"""
+        after = decode_cursor(cursor, MESSAGE_CURSOR) if cursor else 0
+        rows = await self._read(
+            "SELECT id, role, content, created_at FROM messages"
+            " WHERE conversation_id = ? AND id > ? ORDER BY id LIMIT ?",
+            (conversation_id, after, limit + 1)
+        )
+        page, next_cursor = self._paginate(rows, limit, lambda row: row["id"])
+        return {"messages": page, "next_cursor": next_cursor}
+
+    async def search(self, query: str, limit: int, cursor: Optional[str] = None) -> Dict[str, Any]:
+        """Full-text search over message content, newest matches first"""
+        match = fts_query(query)
+        if not match:
+            return {"results": [], "next_cursor": None}
+        before = decode_cursor(cursor, MESSAGE_CURSOR) if cursor else MAX_ROWID
+        rows = await self._read(
+            "SELECT m.id, m.conversation_id, m.role, m.created_at,"
+            " snippet(messages_fts, 0, '[', ']', '…', 12) AS snippet"
+            " FROM messages_fts JOIN messages m ON m.id = messages_fts.rowid"
+            " WHERE messages_fts MATCH ? AND messages_fts.rowid < ?"
+            " ORDER BY messages_fts.rowid DESC LIMIT ?",
+            (match, before, limit + 1)
+        )
+        page, next_cursor = self._paginate(rows, limit, lambda row: row["id"])
+        return {"results": page, "next_cursor": next_cursor}
+
+    @staticmethod
+    def _paginate(rows: List[Dict[str, Any]], limit: int, sort_key) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        # One extra row was fetched to tell whether another page exists
+        if len(rows) <= limit:
+            return rows, None
+        page = rows[:limit]
+        return page, encode_cursor(sort_key(page[-1]))
+
+    def _open(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Other worker processes write to the same file; wait for their commits
+        self._write_conn = sqlite3.connect(self.path, timeout=10.0, check_same_thread=False)
+        self._write_conn.execute("PRAGMA journal_mode=WAL")
+        # WAL keeps committed data safe across crashes with NORMAL sync
+        self._write_conn.execute("PRAGMA synchronous=NORMAL")
+        self._write_conn.executescript(SCHEMA)
+        self._read_conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._read_conn.row_factory = sqlite3.Row
+
+    async def _read(self, sql: str, params: Tuple) -> List[Dict[str, Any]]:
+        return await asyncio.to_thread(self._execute_read, sql, params)
+
+    def _execute_read(self, sql: str, params: Tuple) -> List[Dict[str, Any]]:
+        with self._read_lock:
+            return [dict(row) for row in self._read_conn.execute(sql, params)]
+
+    async def _write_batches(self) -> None:
+        while True:
+            item = await self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            stop = self._drain(batch)
+            if not stop and len(batch) < self.batch_size:
+                # Let a burst of turns accumulate so they share one commit
+                await asyncio.sleep(self.flush_interval)
+                stop = self._drain(batch)
+            try:
+                await asyncio.to_thread(self._write_batch, batch)
+            except sqlite3.Error as e:
+                logger.error(f"Failed to store {len(batch)} messages: {e}")
+            if stop:
+                return
+
+    def _drain(self, batch: List[Tuple]) -> bool:
+        """Move queued messages into ``batch``; True once the close sentinel is reached"""
+        while len(batch) < self.batch_size and not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is None:
+                return True
+            batch.append(item)
+        return False
+
+    def _write_batch(self, batch: List[Tuple]) -> None:
+        conversations: Dict[str, Tuple[str, Optional[str], float]] = {}
+        for conversation_id, model, role, content, created_at in batch:
+            _, title, _ = conversations.get(conversation_id, (model, None, created_at))
+            if title is None and role == "user":
+                title = content[:TITLE_LENGTH]
+            conversations[conversation_id] = (model, title, created_at)
+
+        with self._write_conn:
+            self._write_conn.executemany(
+                "INSERT INTO conversations (id, title, model, created_at, updated_at)"
+                " VALUES (?, ?, ?, ?, ?)"
+                " ON CONFLICT (id) DO UPDATE SET"
+                " title = COALESCE(conversations.title, excluded.title),"
+                " model = excluded.model,"
+                " updated_at = excluded.updated_at",
+                [
+                    (conversation_id, title, model, created_at, created_at)
+                    for conversation_id, (model, title, created_at) in conversations.items()
+                ]
+            )
+            self._write_conn.executemany(
+                "INSERT INTO messages (conversation_id, role, content, created_at)"
+                " VALUES (?, ?, ?, ?)",
+                [
+                    (conversation_id, role, content, created_at)
+                    for conversation_id, _, role, content, created_at in batch
+                ]
+            )
+
+
+# Global conversation store instance
+conversation_store = ConversationStore(
+    path=get_settings().CONVERSATION_DB_PATH,
+    batch_size=get_settings().CONVERSATION_WRITE_BATCH_SIZE,
+    flush_interval=get_settings().CONVERSATION_FLUSH_INTERVAL,
+)
@@ -1,33 +1,88 @@
+import asyncio
+import json
 import logging
+import random
 import time
 from contextlib import asynccontextmanager
-from typing import List, Optional, Dict, Any
+from functools import partial
+from typing import List, Optional, Dict, Any, AsyncGenerator, Tuple
 
+import anyio
 import httpx
 from fastapi import FastAPI, HTTPException, Request, status, Depends, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, StreamingResponse
-from pydantic import BaseModel, Field
+from fastapi.responses import JSONResponse, ORJSONResponse, PlainTextResponse, Response, StreamingResponse
+from pydantic import ValidationError
+from slowapi import Limiter
+from slowapi.errors import RateLimitExceeded
+from starlette.background import BackgroundTask
 
 from config import get_settings, logger, setup_logging
+from conversation_store import conversation_store
+from metrics import http_request_duration, observe_generation, registry
+from http_utils import etag_matches
+from model_catalog import CatalogSnapshot, model_catalog
+from models import ChatBatchRequest, ChatRequest, Message, ModelWarmRequest, SessionChatRequest, SessionCreateRequest
+from ollama_client import (
+    JSON_HEADERS,
+    SSE_HEADERS,
+    ClientDisconnected,
+    cancel_on_disconnect,
+    iter_lines,
+    open_stream,
+    passthrough,
+    relay_as_sse,
+)
+from response_cache import CACHE_MISS, is_cacheable, response_cache
+from ollama_pool import OllamaPool, OllamaUnavailable, create_ollama_pool, get_ollama_pool, keep_alive_for
+from scheduler import Lease, SchedulerFull, get_client_key, scheduler
+from sessions import Session, session_store
+from shared_state import shared_state
 from websocket import websocket_endpoint, manager
+from routers import conversations as conversations_router
 from routers import tts as tts_router
 import uuid
 
-# Setup logging
-setup_logging()
+try:
+    # Optional: orjson serializes the JSON this app builds several times faster
+    import orjson  # noqa: F401
+    FastJSONResponse = ORJSONResponse
+except ImportError:
+    FastJSONResponse = JSONResponse
 
 # Application lifespan
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Startup
-    logger.info("Starting application...")
-    logger.info(f"Environment: {get_settings().model_dump_json(indent=2)}")
+    # Startup; logging is configured here rather than on import, so importing
+    # the app has no side effects
+    setup_logging()
+    settings = get_settings()
+    logger.info(
+        "Starting {app} {version} - Ollama: {ollama_urls}",
+        app=settings.APP_NAME,
+        version=settings.APP_VERSION,
+        ollama_urls=settings.OLLAMA_BASE_URLS or [settings.OLLAMA_BASE_URL]
+    )
+    # Only rendered when DEBUG logging is enabled; never includes the secret
+    logger.opt(lazy=True).debug(
+        "Settings: {}",
+        lambda: settings.model_dump_json(exclude={"SECRET_KEY"})
+    )
+    app.state.ollama_pool = create_ollama_pool(settings)
+    await app.state.ollama_pool.start()
+    for model in settings.OLLAMA_PRELOAD_MODELS:
+        app.state.ollama_pool.warm(model)
+    session_sweeper = asyncio.create_task(session_store.run_sweeper(60.0))
+    await conversation_store.start()
     
     yield  # Application runs here
     
     # Shutdown
     logger.info("Shutting down application...")
+    session_sweeper.cancel()
+    await conversation_store.close()
+    await app.state.ollama_pool.close()
+    shared_state.close()
 
 # Create FastAPI app
 app = FastAPI(
@@ -36,9 +91,14 @@ app = FastAPI(
     version=get_settings().APP_VERSION,
     docs_url="/docs",
     redoc_url="/redoc",
+    default_response_class=FastJSONResponse,
     lifespan=lifespan
 )
 
+# Per-client request rate limit (RATE_LIMIT) on the Ollama-facing endpoints
+limiter = Limiter(key_func=get_client_key)
+app.state.limiter = limiter
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -48,35 +108,50 @@ app.add_middleware(
     allow_headers=get_settings().CORS_HEADERS,
 )
 
-# Models
-class Message(BaseModel):
-    role: str = Field(..., description="The role of the message sender (user/assistant/system)")
-    content: str = Field(..., description="The content of the message")
-
-class ChatRequest(BaseModel):
-    model: str = Field(..., description="The model to use for generation")
-    messages: List[Message] = Field(..., description="List of messages in the conversation")
-    stream: bool = Field(False, description="Whether to stream the response")
-    temperature: Optional[float] = Field(0.7, ge=0.0, le=2.0, description="Sampling temperature")
-    max_tokens: Optional[int] = Field(None, ge=1, description="Maximum number of tokens to generate")
+def access_log_level(route: str, status_code: int) -> Optional[str]:
+    """Level for a request's access-log line, or None when it is sampled out"""
+    if status_code >= 500:
+        return "ERROR"
+    settings = get_settings()
+    rate = settings.LOG_ROUTE_SAMPLE_RATES.get(route, settings.LOG_REQUEST_SAMPLE_RATE)
+    if rate < 1.0 and random.random() >= rate:
+        return None
+    return settings.LOG_ROUTE_LEVELS.get(route, "INFO")
 
 # Middleware for request/response logging
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
     start_time = time.time()
     
-    # Log request
-    logger.info(f"Request: {request.method} {request.url}")
-    
     try:
         response = await call_next(request)
     except Exception as e:
-        logger.error(f"Request error: {str(e)}")
+        logger.error(f"Request error: {request.method} {request.url.path}: {str(e)}")
         raise
     
     # Calculate process time
     process_time = (time.time() - start_time) * 1000
-    logger.info(f"Request completed in {process_time:.2f}ms | Status: {response.status_code}")
+    # Label by route template so path parameters do not explode cardinality
+    route = getattr(request.scope.get("route"), "path", "unmatched")
+    http_request_duration.observe(
+        process_time / 1000,
+        request.method,
+        route,
+        str(response.status_code)
+    )
+    
+    # One line per request; the message is only formatted if a sink takes it
+    level = access_log_level(route, response.status_code)
+    if level is not None:
+        logger.log(
+            level,
+            "{method} {path} {status} {duration_ms:.2f}ms",
+            method=request.method,
+            path=request.url.path,
+            route=route,
+            status=response.status_code,
+            duration_ms=process_time
+        )
     
     return response
 
@@ -84,15 +159,25 @@ async def log_requests(request: Request, call_next):
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exc: HTTPException):
     logger.error(f"HTTP error: {exc.detail}")
-    return JSONResponse(
+    return FastJSONResponse(
         status_code=exc.status_code,
         content={"detail": exc.detail},
+        headers=exc.headers,
+    )
+
+@app.exception_handler(RateLimitExceeded)
+async def rate_limit_exception_handler(request: Request, exc: RateLimitExceeded):
+    logger.warning(f"Rate limit exceeded for {get_client_key(request)}: {exc.detail}")
+    return FastJSONResponse(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        content={"detail": f"Rate limit exceeded: {exc.detail}"},
+        headers={"Retry-After": str(exc.limit.limit.get_expiry())},
     )
 
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
     logger.error(f"Unexpected error: {str(exc)}", exc_info=True)
-    return JSONResponse(
+    return FastJSONResponse(
         status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
         content={"detail": "Internal server error"},
     )
@@ -105,50 +190,270 @@ async def websocket_voice(websocket: WebSocket, client_id: str):
 
 # Include API routers
 app.include_router(tts_router.router)
+app.include_router(conversations_router.router)
+
+# Status used when the client went away before a response could be sent
+CLIENT_CLOSED_REQUEST = 499
+
+def too_busy(e: SchedulerFull) -> HTTPException:
+    """Turn a full scheduler queue into a 429 carrying Retry-After"""
+    logger.warning(f"Rejected request for {e.model}: queue full")
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail=str(e),
+        headers={"Retry-After": str(e.retry_after)}
+    )
+
+def unavailable(e: OllamaUnavailable) -> HTTPException:
+    """Fail fast with 503 while every Ollama node is known to be down"""
+    logger.warning("Rejected request: Ollama is down")
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=str(e),
+        headers={"Retry-After": str(e.retry_after)}
+    )
+
+async def admit(request: Request, model: str) -> Lease:
+    """Wait for an Ollama slot for ``model``, or fail fast with 429 when the queue is full"""
+    try:
+        return await cancel_on_disconnect(
+            request,
+            scheduler.acquire(model, get_client_key(request))
+        )
+    except SchedulerFull as e:
+        raise too_busy(e)
+
+async def stream_from_ollama(
+    pool: OllamaPool,
+    request: Request,
+    path: str,
+    payload: bytes,
+    model: str,
+    label: str,
+    lease: Lease
+) -> StreamingResponse:
+    """
+    Open a streaming call to Ollama and relay it to the browser as SSE.
+    
+    Takes ownership of ``lease`` and releases it once the stream is over.
+    """
+    settings = get_settings()
+    start_time = time.perf_counter()
+    try:
+        node = pool.checkout(model)
+    except BaseException:
+        lease.release()
+        raise
+    try:
+        response = await cancel_on_disconnect(
+            request,
+            open_stream(node.client, path, payload)
+        )
+    except BaseException as e:
+        node.release(e)
+        lease.release()
+        raise
+    
+    errors: List[BaseException] = []
+    
+    async def upstream_lines():
+        try:
+            async for line in iter_lines(response, settings.OLLAMA_INTER_TOKEN_TIMEOUT):
+                yield line
+        except Exception as e:
+            # relay_as_sse turns it into an error event; the breaker still has to see it
+            errors.append(e)
+            raise
+    
+    async def finish():
+        await response.aclose()
+        node.release(errors[0] if errors else None)
+        lease.release()
+    
+    return StreamingResponse(
+        relay_as_sse(upstream_lines(), label, start_time),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+        # Runs even when the stream is cancelled by a client disconnect
+        background=BackgroundTask(finish)
+    )
+
+async def call_ollama(
+    pool: OllamaPool,
+    path: str,
+    payload: bytes,
+    model: str,
+    client_key: str
+) -> Tuple[bytes, str]:
+    """Make one non-streaming Ollama call under a scheduler lease; returns body and content type"""
+    pool.ensure_available()
+    lease = await scheduler.acquire(model, client_key)
+    try:
+        with pool.checkout(model) as node:
+            response = await node.client.post(path, content=payload, headers=JSON_HEADERS)
+            response.raise_for_status()
+    finally:
+        lease.release()
+    observe_generation(response.content, model)
+    return response.content, response.headers.get("content-type", "application/json")
+
+async def stream_ollama_lines(
+    pool: OllamaPool,
+    path: str,
+    payload: bytes,
+    model: str,
+    client_key: str
+) -> AsyncGenerator[str, None]:
+    """Yield the NDJSON lines of one streaming Ollama call under a scheduler lease"""
+    pool.ensure_available()
+    lease = await scheduler.acquire(model, client_key)
+    try:
+        with pool.checkout(model) as node:
+            response = await open_stream(node.client, path, payload)
+            try:
+                async for line in iter_lines(response, get_settings().OLLAMA_INTER_TOKEN_TIMEOUT):
+                    yield line
+            finally:
+                with anyio.CancelScope(shield=True):
+                    await response.aclose()
+    finally:
+        lease.release()
+
+async def forward_cached(
+    pool: OllamaPool,
+    request: Request,
+    path: str,
+    chat_request: ChatRequest,
+    payload: bytes,
+    label: str
+):
+    """
+    Answer a deterministic request from the response cache.
+    
+    Misses are coalesced: identical requests in flight share one upstream
+    call, which runs under the scheduler lease of the request that started it.
+    Hits are served even while Ollama is down; misses fail fast then.
+    """
+    key = response_cache.make_key(path, payload)
+    upstream_args = (pool, path, payload, chat_request.model, get_client_key(request))
+    
+    if chat_request.stream:
+        start_time = time.perf_counter()
+        lines, cache_status = await cancel_on_disconnect(
+            request,
+            response_cache.stream(key, partial(stream_ollama_lines, *upstream_args))
+        )
+        logger.debug("{} stream - Cache: {}", label, cache_status)
+        # Only a miss started its own upstream call; replays would skew the TTFT histogram
+        return StreamingResponse(
+            relay_as_sse(lines, label, start_time if cache_status == CACHE_MISS else None),
+            media_type="text/event-stream",
+            headers={**SSE_HEADERS, "X-Cache": cache_status}
+        )
+    
+    (body, media_type), cache_status = await cancel_on_disconnect(
+        request,
+        response_cache.fetch(key, partial(call_ollama, *upstream_args))
+    )
+    logger.debug("{} response - Cache: {}", label, cache_status)
+    return Response(body, media_type=media_type, headers={"X-Cache": cache_status})
+
+async def forward_to_ollama(
+    pool: OllamaPool,
+    request: Request,
+    path: str,
+    chat_request: ChatRequest,
+    label: str
+):
+    """Send a chat or generate request to Ollama, streaming or not"""
+    # Serialize straight to bytes; pydantic's encoder skips the dict copy
+    if chat_request.keep_alive is None:
+        chat_request.keep_alive = keep_alive_for(chat_request.model)
+    payload = chat_request.model_dump_json(exclude_none=True).encode("utf-8")
+    
+    if is_cacheable(chat_request, request):
+        return await forward_cached(pool, request, path, chat_request, payload, label)
+    
+    # Known-down upstream: answer now rather than after queueing for a slot
+    pool.ensure_available()
+    lease = await admit(request, chat_request.model)
+    if chat_request.stream:
+        return await stream_from_ollama(pool, request, path, payload, chat_request.model, label, lease)
+    
+    try:
+        with pool.checkout(chat_request.model) as node:
+            response = await cancel_on_disconnect(
+                request,
+                node.client.post(path, content=payload, headers=JSON_HEADERS)
+            )
+            response.raise_for_status()
+    finally:
+        lease.release()
+    observe_generation(response.content, chat_request.model)
+    
+    # Log successful response
+    logger.debug("{} response - Status: {}", label, response.status_code)
+    return passthrough(response)
 
 # API endpoints
 @app.get("/api/health", tags=["Health"])
-async def health_check():
+async def health_check(pool: OllamaPool = Depends(get_ollama_pool)):
     """
-    Health check endpoint
+    Liveness check
+    
+    Succeeds whenever the process can answer, even while Ollama is down, so
+    an orchestrator does not restart the backend over an upstream outage;
+    use /api/ready to decide whether to route traffic here. Ollama's state
+    comes from the pool's background probes, so these checks never reach
+    Ollama themselves.
     
     Returns:
         dict: Status of the API
     """
-    try:
-        # Check connection to Ollama
-        async with httpx.AsyncClient() as client:
-            response = await client.get(f"{get_settings().OLLAMA_BASE_URL}/api/tags", timeout=5.0)
-            response.raise_for_status()
-            
-        return {
-            "status": "healthy",
-            "version": get_settings().APP_VERSION,
-            "ollama_connected": True
-        }
-    except Exception as e:
-        logger.error(f"Health check failed: {str(e)}")
-        raise HTTPException(
-            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-            detail="Service temporarily unavailable"
-        )
+    nodes = pool.stats()
+    healthy = sum(node["healthy"] for node in nodes)
+    probes = [node["last_probe"] for node in nodes if node["last_probe"] is not None]
+    return {
+        "status": "healthy",
+        "version": get_settings().APP_VERSION,
+        "ollama_connected": pool.probed and bool(healthy),
+        "ollama_nodes_healthy": healthy,
+        "ollama_nodes": len(nodes),
+        "checked_at": min(probes) if probes else None
+    }
 
-@app.get("/api/tags", tags=["Models"])
-async def get_models():
+@app.get("/api/ready", tags=["Health"])
+async def readiness_check(pool: OllamaPool = Depends(get_ollama_pool)):
     """
-    Get available models from Ollama
+    Readiness check
+    
+    Fails with 503 until the first Ollama probes are back and while every
+    Ollama node is down.
     
     Returns:
-        dict: List of available models
+        dict: Readiness of the API
     """
+    if not pool.probed:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Starting up",
+            headers={"Retry-After": "1"}
+        )
+    if not pool.healthy:
+        errors = "; ".join(f"{node.url}: {node.last_error}" for node in pool.nodes if not node.healthy)
+        logger.error(f"Readiness check failed: {errors}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Service temporarily unavailable"
+        )
+    return {"status": "ready"}
+
+async def load_catalog(pool: OllamaPool) -> CatalogSnapshot:
+    """The cached model catalogue, with upstream failures mapped to HTTP errors"""
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{get_settings().OLLAMA_BASE_URL}/api/tags",
-                timeout=get_settings().OLLAMA_TIMEOUT
-            )
-            response.raise_for_status()
-            return response.json()
+        return await model_catalog.get(pool.merged_tags)
+    except OllamaUnavailable as e:
+        raise unavailable(e)
     except httpx.RequestError as e:
         logger.error(f"Failed to connect to Ollama: {str(e)}")
         raise HTTPException(
@@ -162,38 +467,177 @@ async def get_models():
             detail="Failed to retrieve models"
         )
 
+@app.get("/api/tags", tags=["Models"])
+async def get_models(request: Request, pool: OllamaPool = Depends(get_ollama_pool)):
+    """
+    Get available models from Ollama
+    
+    Served from an in-memory catalogue refreshed every MODEL_CATALOG_TTL
+    seconds, so listing models never waits behind a busy Ollama. With
+    several Ollama servers configured, the lists are merged by name.
+    Send the returned ETag back in If-None-Match to get a 304 when the
+    list has not changed.
+    
+    Returns:
+        dict: List of available models
+    """
+    catalog = await load_catalog(pool)
+    headers = {"ETag": catalog.etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), catalog.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(catalog.body, media_type="application/json", headers=headers)
+
+@app.get("/api/models", tags=["Models"])
+async def list_models(
+    family: Optional[str] = None,
+    max_parameters: Optional[float] = None,
+    max_size_gb: Optional[float] = None,
+    pool: OllamaPool = Depends(get_ollama_pool)
+):
+    """
+    Installed models with their size, family and parameter count, filtered
+    
+    Args:
+        family: Only models of this family (e.g. "llama")
+        max_parameters: Only models with at most this many billion parameters
+        max_size_gb: Only models whose weights take at most this many GiB
+        
+    Returns:
+        dict: Matching models
+    """
+    catalog = await load_catalog(pool)
+    models = catalog.described
+    if family is not None:
+        models = [m for m in models if m["family"] == family or family in m["families"]]
+    if max_parameters is not None:
+        limit = max_parameters * 1e9
+        models = [m for m in models if m["parameters"] is not None and m["parameters"] <= limit]
+    if max_size_gb is not None:
+        models = [m for m in models if m["size_gb"] <= max_size_gb]
+    return {"models": [{**m, "loaded": pool.resident(m["name"])} for m in models]}
+
+@app.get("/api/models/loaded", tags=["Models"])
+async def loaded_models(pool: OllamaPool = Depends(get_ollama_pool)):
+    """
+    Models currently held in memory, as last reported by Ollama's /api/ps
+    
+    Returns:
+        dict: Loaded models with the servers holding them
+    """
+    return {"models": pool.resident_models()}
+
+@app.post("/api/models/warm", tags=["Models"])
+async def warm_model(warm_request: ModelWarmRequest, pool: OllamaPool = Depends(get_ollama_pool)):
+    """
+    Start loading a model so the next chat does not wait for it
+    
+    Meant to be called as soon as the user picks a model. Returns at once:
+    200 when the model is already loaded, 202 while it is loading.
+    
+    Args:
+        warm_request: The model, and optionally how long to keep it loaded
+        
+    Returns:
+        dict: The model and whether it is "loaded" or "loading"
+    """
+    if pool.resident(warm_request.model) and warm_request.keep_alive is None:
+        return {"model": warm_request.model, "status": "loaded"}
+    try:
+        pool.ensure_available()
+    except OllamaUnavailable as e:
+        raise unavailable(e)
+    pool.warm(warm_request.model, warm_request.keep_alive)
+    return FastJSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
+        content={"model": warm_request.model, "status": "loading"}
+    )
+
+@app.get("/api/models/stats", tags=["Models"])
+async def model_catalog_stats():
+    """
+    Freshness and hit counters of the model catalogue
+    
+    Returns:
+        dict: Catalogue statistics
+    """
+    return model_catalog.stats()
+
+@app.get("/metrics", tags=["Health"], response_class=PlainTextResponse)
+async def metrics():
+    """
+    Prometheus metrics in the text exposition format
+    """
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/api/scheduler/stats", tags=["Health"])
+async def scheduler_stats():
+    """
+    Per-model concurrency, queue depth and queue wait times
+    
+    Returns:
+        dict: Scheduler statistics keyed by model
+    """
+    return scheduler.stats()
+
+@app.get("/api/ollama/nodes", tags=["Health"])
+async def ollama_nodes(pool: OllamaPool = Depends(get_ollama_pool)):
+    """
+    Health, load and resident models of every Ollama server in the pool
+
+    Returns:
+        list: One entry per configured server
+    """
+    return pool.stats()
+
+@app.get("/api/chat/cache/stats", tags=["Chat"])
+async def response_cache_stats():
+    """
+    Hit/miss counters for the deterministic response cache
+    
+    Returns:
+        dict: Cache statistics
+    """
+    return response_cache.stats()
+
 @app.post("/api/chat", tags=["Chat"])
-async def chat(chat_request: ChatRequest, request: Request):
+@limiter.limit(get_settings().RATE_LIMIT)
+async def chat(
+    chat_request: ChatRequest,
+    request: Request,
+    pool: OllamaPool = Depends(get_ollama_pool)
+):
     """
-    Chat with the Ollama model
+    Chat with the Ollama model (supports streaming)
     
     Args:
         chat_request: The chat request containing messages and model info
         
     Returns:
-        dict: The model's response
+        StreamingResponse or dict: SSE token stream or the model's response
     """
-    logger.info(f"Chat request - Model: {chat_request.model}, Messages: {len(chat_request.messages)}")
+    logger.debug("Chat request - Model: {}, Messages: {}", chat_request.model, len(chat_request.messages))
     
     try:
-        url = f"{get_settings().OLLAMA_BASE_URL}/api/chat"
-        timeout = get_settings().OLLAMA_TIMEOUT
-        
-        # Prepare request data
-        request_data = chat_request.dict(exclude_none=True)
-        
-        async with httpx.AsyncClient(timeout=timeout) as client:
-            response = await client.post(
-                url,
-                json=request_data,
-                timeout=timeout
-            )
-            response.raise_for_status()
-            
-            # Log successful response
-            logger.info(f"Chat response - Status: {response.status_code}")
-            return response.json()
+        return await forward_to_ollama(pool, request, "/api/chat", chat_request, "Chat")
             
+    except HTTPException:
+        raise
+    except SchedulerFull as e:
+        raise too_busy(e)
+    except OllamaUnavailable as e:
+        raise unavailable(e)
+    except httpx.ConnectError as e:
+        logger.error(f"Failed to connect to Ollama: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Failed to connect to Ollama service"
+        )
+    except ClientDisconnected:
+        logger.info("Chat request cancelled: client disconnected")
+        raise HTTPException(
+            status_code=CLIENT_CLOSED_REQUEST,
+            detail="Client closed request"
+        )
     except httpx.TimeoutException:
         logger.error("Request to Ollama timed out")
         raise HTTPException(
@@ -213,8 +657,135 @@ async def chat(chat_request: ChatRequest, request: Request):
             detail="An error occurred while processing your request"
         )
 
+async def run_batch_item(
+    pool: OllamaPool,
+    request: Request,
+    index: int,
+    item: Any,
+    client_key: str
+) -> Tuple[bytes, bool]:
+    """
+    Run one request of a batch; returns its NDJSON result line and whether it succeeded.
+    
+    Failures, invalid requests included, are reported in the line rather
+    than raised, so one bad request does not end the batch.
+    """
+    try:
+        chat_request = ChatRequest.model_validate(item)
+    except ValidationError as e:
+        error = {
+            "index": index,
+            "status": status.HTTP_422_UNPROCESSABLE_ENTITY,
+            "error": "Invalid chat request",
+            "detail": e.errors(include_url=False, include_context=False, include_input=False)
+        }
+        return json.dumps(error).encode("utf-8") + b"\n", False
+    chat_request.stream = False
+    if chat_request.keep_alive is None:
+        chat_request.keep_alive = keep_alive_for(chat_request.model)
+    payload = chat_request.model_dump_json(exclude_none=True).encode("utf-8")
+    upstream_args = (pool, "/api/chat", payload, chat_request.model, client_key)
+    try:
+        if is_cacheable(chat_request, request):
+            key = response_cache.make_key("/api/chat", payload)
+            (body, _), _ = await response_cache.fetch(key, partial(call_ollama, *upstream_args))
+        else:
+            body, _ = await call_ollama(*upstream_args)
+        # Ollama's reply is embedded as-is rather than parsed and encoded again
+        return b'{"index":%d,"status":200,"response":%s}\n' % (index, body.strip()), True
+    except SchedulerFull as e:
+        error = {"status": status.HTTP_429_TOO_MANY_REQUESTS, "error": str(e), "retry_after": e.retry_after}
+    except OllamaUnavailable as e:
+        error = {"status": status.HTTP_503_SERVICE_UNAVAILABLE, "error": str(e), "retry_after": e.retry_after}
+    except httpx.TimeoutException:
+        error = {"status": status.HTTP_504_GATEWAY_TIMEOUT, "error": "Request to Ollama service timed out"}
+    except httpx.HTTPStatusError as e:
+        error = {"status": e.response.status_code, "error": f"Ollama API error: {str(e)}"}
+    except httpx.RequestError as e:
+        logger.error(f"Failed to connect to Ollama: {str(e)}")
+        error = {"status": status.HTTP_503_SERVICE_UNAVAILABLE, "error": "Failed to connect to Ollama service"}
+    except Exception as e:
+        logger.error(f"Batch chat error: {str(e)}", exc_info=True)
+        error = {"status": status.HTTP_500_INTERNAL_SERVER_ERROR, "error": "An error occurred while processing your request"}
+    return json.dumps({"index": index, **error}).encode("utf-8") + b"\n", False
+
+async def stream_batch(
+    pool: OllamaPool,
+    request: Request,
+    batch: ChatBatchRequest,
+    concurrency: int
+) -> AsyncGenerator[bytes, None]:
+    """Run a batch ``concurrency`` requests at a time, yielding each result as it completes"""
+    client_key = get_client_key(request)
+    slots = asyncio.Semaphore(concurrency)
+    
+    async def run(index: int, item: Any) -> Tuple[bytes, bool]:
+        async with slots:
+            return await run_batch_item(pool, request, index, item, client_key)
+    
+    tasks = [asyncio.create_task(run(index, item)) for index, item in enumerate(batch.requests)]
+    errors = 0
+    try:
+        for result in asyncio.as_completed(tasks):
+            line, ok = await result
+            errors += not ok
+            yield line
+        yield json.dumps({"done": True, "requests": len(tasks), "errors": errors}).encode("utf-8") + b"\n"
+    finally:
+        # The client went away mid-batch: drop what has not run yet
+        for task in tasks:
+            task.cancel()
+        with anyio.CancelScope(shield=True):
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+@app.post("/api/chat/batch", tags=["Chat"])
+@limiter.limit(get_settings().RATE_LIMIT)
+async def chat_batch(
+    batch: ChatBatchRequest,
+    request: Request,
+    pool: OllamaPool = Depends(get_ollama_pool)
+):
+    """
+    Run many chat requests in one call
+    
+    Requests go to Ollama at most ``concurrency`` at a time, through the
+    same scheduler and response cache as /api/chat. Results stream back as
+    NDJSON in completion order, one line per request tagged with its
+    ``index`` in the batch, then a summary line with ``done``. A request
+    that fails, or is invalid (status 422), gets a line with its ``status``
+    and ``error`` instead of failing the batch. The whole batch counts once against the rate limit.
+    
+    Args:
+        batch: The chat requests and an optional concurrency
+        
+    Returns:
+        StreamingResponse: NDJSON result lines
+    """
+    settings = get_settings()
+    if len(batch.requests) > settings.CHAT_BATCH_MAX_REQUESTS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Batch too large: at most {settings.CHAT_BATCH_MAX_REQUESTS} requests"
+        )
+    try:
+        # Known-down upstream: fail the batch now rather than every request in it
+        pool.ensure_available()
+    except OllamaUnavailable as e:
+        raise unavailable(e)
+    concurrency = min(batch.concurrency or settings.CHAT_BATCH_CONCURRENCY, settings.CHAT_BATCH_CONCURRENCY)
+    logger.debug("Chat batch - Requests: {}, Concurrency: {}", len(batch.requests), concurrency)
+    return StreamingResponse(
+        stream_batch(pool, request, batch, concurrency),
+        media_type="application/x-ndjson"
+    )
+
 @app.post("/api/generate", tags=["Generate"])
-async def generate(chat_request: ChatRequest, request: Request):
+@limiter.limit(get_settings().RATE_LIMIT)
+async def generate(
+    chat_request: ChatRequest,
+    request: Request,
+    pool: OllamaPool = Depends(get_ollama_pool)
+):
     """
     Generate text with the Ollama model (supports streaming)
     
@@ -224,37 +795,29 @@ async def generate(chat_request: ChatRequest, request: Request):
     Returns:
         StreamingResponse or dict: Streamed or complete response
     """
-    logger.info(f"Generate request - Model: {chat_request.model}, Stream: {chat_request.stream}")
+    logger.debug("Generate request - Model: {}, Stream: {}", chat_request.model, chat_request.stream)
     
     try:
-        url = f"{get_settings().OLLAMA_BASE_URL}/api/generate"
-        timeout = get_settings().OLLAMA_TIMEOUT
-        
-        # Prepare request data
-        request_data = chat_request.dict(exclude_none=True)
-        
-        async with httpx.AsyncClient(timeout=timeout) as client:
-            response = await client.post(
-                url,
-                json=request_data,
-                timeout=timeout,
-                stream=chat_request.stream
-            )
-            response.raise_for_status()
-            
-            if chat_request.stream:
-                async def generate_stream():
-                    async for chunk in response.aiter_lines():
-                        if chunk:
-                            yield f"data: {chunk}\n\n"
-                
-                return StreamingResponse(
-                    generate_stream(),
-                    media_type="text/event-stream"
-                )
-            else:
-                return response.json()
+        return await forward_to_ollama(pool, request, "/api/generate", chat_request, "Generate")
                 
+    except HTTPException:
+        raise
+    except SchedulerFull as e:
+        raise too_busy(e)
+    except OllamaUnavailable as e:
+        raise unavailable(e)
+    except httpx.ConnectError as e:
+        logger.error(f"Failed to connect to Ollama: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Failed to connect to Ollama service"
+        )
+    except ClientDisconnected:
+        logger.info("Generate request cancelled: client disconnected")
+        raise HTTPException(
+            status_code=CLIENT_CLOSED_REQUEST,
+            detail="Client closed request"
+        )
     except httpx.TimeoutException:
         logger.error("Generate request to Ollama timed out")
         raise HTTPException(
@@ -274,17 +837,174 @@ async def generate(chat_request: ChatRequest, request: Request):
             detail="An error occurred while generating text"
         )
 
+def sessions_shared() -> bool:
+    """Whether sessions have to be visible to other worker processes"""
+    return get_settings().WORKERS > 1
+
+async def publish_session(session: Session) -> None:
+    """Store the session's latest state where the other workers can load it"""
+    if sessions_shared():
+        state = {**session.to_dict(), "version": session.version}
+        await shared_state.put(
+            f"session:{session.id}",
+            json.dumps(state).encode("utf-8"),
+            ttl=get_settings().SESSION_IDLE_TIMEOUT
+        )
+
+async def sync_session(session_id: str, session: Optional[Session]) -> Optional[Session]:
+    """
+    Reconcile this worker's copy of a session with the shared one.
+    
+    Another worker may have created the session, added turns to it or
+    deleted it since this one last saw it.
+    """
+    record = await shared_state.get(f"session:{session_id}")
+    if record is None:
+        # Deleted or expired elsewhere
+        if session is not None:
+            session_store.delete(session_id)
+        return None
+    state = json.loads(record[0])
+    if session is None or state["version"] > session.version:
+        session = session_store.restore(state)
+    return session
+
+async def get_session_or_404(session_id: str) -> Session:
+    session = session_store.get(session_id)
+    if sessions_shared():
+        session = await sync_session(session_id, session)
+    if session is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Session not found or expired"
+        )
+    return session
+
+async def record_turn(session: Session, message: Message, reply: Message) -> None:
+    """Add a completed turn to the session and queue it for the conversation store"""
+    session.append(message, reply)
+    conversation_store.record(session.id, session.model, [message.dict(), reply.dict()])
+    await publish_session(session)
+
+async def record_streamed_turn(
+    session: Session,
+    message: Message,
+    events: AsyncGenerator[str, None]
+) -> AsyncGenerator[str, None]:
+    """Relay a streamed reply and add the turn to the session once it completes"""
+    reply = []
+    complete = False
+    async for event in events:
+        if event.startswith("data: "):
+            data = json.loads(event[len("data: "):])
+            reply.append(data.get("message", {}).get("content", ""))
+            complete = bool(data.get("done")) and "error" not in data
+        yield event
+    if complete:
+        await record_turn(session, message, Message(role="assistant", content="".join(reply)))
+
+@app.post("/api/sessions", tags=["Sessions"], status_code=status.HTTP_201_CREATED)
+async def create_session(session_request: SessionCreateRequest):
+    """
+    Start a server-side conversation
+    
+    Args:
+        session_request: Model, optional seed history and context budget
+        
+    Returns:
+        dict: The new session's id and settings
+    """
+    session = session_store.create(
+        session_request.model,
+        session_request.messages,
+        session_request.context_tokens
+    )
+    if session.messages:
+        conversation_store.record(session.id, session.model, [m.dict() for m in session.messages])
+    await publish_session(session)
+    logger.debug("Session created - Model: {}, Messages: {}", session.model, len(session.messages))
+    return {
+        "session_id": session.id,
+        "model": session.model,
+        "context_tokens": session.context_tokens,
+    }
+
+@app.get("/api/sessions/{session_id}", tags=["Sessions"])
+async def get_session(session_id: str):
+    """
+    Get a session's stored history
+    
+    Returns:
+        dict: Session settings and messages
+    """
+    return (await get_session_or_404(session_id)).to_dict()
+
+@app.delete("/api/sessions/{session_id}", tags=["Sessions"], status_code=status.HTTP_204_NO_CONTENT)
+async def delete_session(session_id: str):
+    """End a session and drop its history"""
+    deleted = session_store.delete(session_id)
+    if sessions_shared():
+        deleted = await shared_state.delete(f"session:{session_id}") or deleted
+    if not deleted:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Session not found or expired"
+        )
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+@app.post("/api/sessions/{session_id}/chat", tags=["Sessions"])
+async def session_chat(
+    session_id: str,
+    turn: SessionChatRequest,
+    request: Request,
+    pool: OllamaPool = Depends(get_ollama_pool)
+):
+    """
+    Chat within a session, sending only the new message
+    
+    The server prepends the stored history (trimmed to the session's context
+    budget) and records the turn once the reply has completed.
+    
+    Args:
+        session_id: Session returned by POST /api/sessions
+        turn: The new message and generation options
+        
+    Returns:
+        StreamingResponse or dict: Same as /api/chat
+    """
+    session = await get_session_or_404(session_id)
+    chat_request = ChatRequest(
+        model=turn.model or session.model,
+        messages=session.prompt(turn.message),
+        stream=turn.stream,
+        temperature=turn.temperature,
+        max_tokens=turn.max_tokens
+    )
+    response = await chat(chat_request=chat_request, request=request, pool=pool)
+    
+    if isinstance(response, StreamingResponse):
+        response.body_iterator = record_streamed_turn(session, turn.message, response.body_iterator)
+        return response
+    
+    reply = json.loads(response.body).get("message") or {}
+    await record_turn(session, turn.message, Message(role="assistant", content=reply.get("content", "")))
+    return response
+
 # Application entry point
 if __name__ == "__main__":
     import uvicorn
     
     settings = get_settings()
+    # Reloading only supports a single worker
+    reload = settings.DEBUG and settings.WORKERS == 1
     
     uvicorn.run(
-        "main:app",
+        # Reload and extra workers need an import string; otherwise pass the
+        # app itself rather than importing this module a second time
+        "main:app" if reload or settings.WORKERS > 1 else app,
         host=settings.HOST,
         port=settings.PORT,
-        reload=settings.DEBUG,
+        reload=reload,
         log_level="info" if not settings.DEBUG else "debug",
-        workers=1
+        workers=settings.WORKERS
     )
\ No newline at end of file
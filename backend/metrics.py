@@ -0,0 +1,220 @@
+"""
+Minimal Prometheus metrics, rendered in the text exposition format.
+
+Recording a sample is a dict lookup plus a few integer updates, cheap enough
+to leave on in production. Gauges that mirror existing state (connections,
+scheduler slots) are computed from callbacks when ``/metrics`` is scraped
+instead of being updated on the hot path.
+"""
+import re
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+LabelValues = Tuple[str, ...]
+
+# Latency buckets in seconds, from sub-millisecond sends to slow generations
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+TOKENS_PER_SECOND_BUCKETS = (1, 2, 5, 10, 15, 20, 30, 40, 60, 80, 100, 150, 200)
+BYTES_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+def _format_labels(names: Sequence[str], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, *labels: str) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def _samples(self) -> Iterable[str]:
+        for labels, value in list(self._values.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+
+
+class Gauge(Metric):
+    """A gauge read from ``callback`` at scrape time; it returns values per label tuple"""
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        callback: Callable[[], Dict[LabelValues, float]],
+        labelnames: Sequence[str] = ()
+    ):
+        super().__init__(name, documentation, labelnames)
+        self._callback = callback
+
+    def _samples(self) -> Iterable[str]:
+        for labels, value in self._callback().items():
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+
+
+class _HistogramSeries:
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self, size: int):
+        self.counts = [0] * size
+        self.total = 0.0
+        self.count = 0
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        buckets: Sequence[float],
+        labelnames: Sequence[str] = ()
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets) + (float("inf"),)
+        self._series: Dict[LabelValues, _HistogramSeries] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = _HistogramSeries(len(self.buckets))
+        # Per-bucket counts; cumulated only when rendering
+        series.counts[bisect_left(self.buckets, value)] += 1
+        series.total += value
+        series.count += 1
+
+    def _samples(self) -> Iterable[str]:
+        for labels, series in list(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series.counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}"
+            label_text = _format_labels(self.labelnames, labels)
+            yield f"{self.name}_sum{label_text} {_format_value(series.total)}"
+            yield f"{self.name}_count{label_text} {series.count}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_request_duration = registry.register(Histogram(
+    "http_request_duration_seconds",
+    "Time until the response starts, per route",
+    LATENCY_BUCKETS,
+    ("method", "route", "status"),
+))
+ollama_time_to_first_token = registry.register(Histogram(
+    "ollama_time_to_first_token_seconds",
+    "Time from sending a streaming request to Ollama until its first token",
+    LATENCY_BUCKETS,
+    ("endpoint",),
+))
+ollama_tokens_per_second = registry.register(Histogram(
+    "ollama_tokens_per_second",
+    "Generation speed reported by Ollama (eval_count / eval_duration)",
+    TOKENS_PER_SECOND_BUCKETS,
+    ("model",),
+))
+ollama_generated_tokens = registry.register(Counter(
+    "ollama_generated_tokens_total",
+    "Tokens generated by Ollama",
+    ("model",),
+))
+tts_synthesis_duration = registry.register(Histogram(
+    "tts_synthesis_duration_seconds",
+    "Time to synthesize one clip with edge-tts",
+    LATENCY_BUCKETS,
+))
+tts_audio_bytes = registry.register(Histogram(
+    "tts_audio_bytes",
+    "Size of synthesized clips",
+    BYTES_BUCKETS,
+))
+ws_send_duration = registry.register(Histogram(
+    "ws_send_duration_seconds",
+    "Time to hand one message to a voice WebSocket",
+    LATENCY_BUCKETS,
+))
+
+
+def register_gauge(
+    name: str,
+    documentation: str,
+    callback: Callable[[], Dict[LabelValues, float]],
+    labelnames: Sequence[str] = ()
+) -> None:
+    registry.register(Gauge(name, documentation, callback, labelnames))
+
+
+# Ollama's final message carries the generation stats; matched on the raw
+# bytes so non-streaming replies can be passed through without parsing
+_MODEL = re.compile(rb'"model":\s*"([^"]*)"')
+_EVAL_COUNT = re.compile(rb'"eval_count":\s*(\d+)')
+_EVAL_DURATION = re.compile(rb'"eval_duration":\s*(\d+)')
+
+
+def observe_generation(body: bytes, model: Optional[str] = None) -> None:
+    """Record token throughput from an Ollama reply or final stream line"""
+    eval_count = _EVAL_COUNT.search(body)
+    eval_duration = _EVAL_DURATION.search(body)
+    if eval_count is None or eval_duration is None:
+        return
+    if model is None:
+        match = _MODEL.search(body)
+        model = match.group(1).decode("utf-8", "replace") if match else "unknown"
+    tokens = int(eval_count.group(1))
+    duration_ns = int(eval_duration.group(1))
+    ollama_generated_tokens.inc(tokens, model)
+    if duration_ns > 0:
+        ollama_tokens_per_second.observe(tokens / (duration_ns / 1e9), model)
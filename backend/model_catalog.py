@@ -0,0 +1,158 @@
+import asyncio
+import hashlib
+import json
+import re
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from loguru import logger
+
+from config import get_settings
+from shared_state import SharedState, shared_state
+
+# Key of the catalogue in the state shared between workers
+SHARED_KEY = "model_catalog"
+
+# "7B", "8.0B", "270M" as reported in Ollama's model details
+_PARAMETER_SIZE = re.compile(r"([\d.]+)\s*([KMBT])", re.IGNORECASE)
+_PARAMETER_SCALE = {"K": 1e3, "M": 1e6, "B": 1e9, "T": 1e12}
+
+
+def parse_parameter_count(parameter_size: Optional[str]) -> Optional[int]:
+    match = _PARAMETER_SIZE.search(parameter_size or "")
+    if match is None:
+        return None
+    return int(float(match.group(1)) * _PARAMETER_SCALE[match.group(2).upper()])
+
+
+def describe_model(model: Dict[str, Any]) -> Dict[str, Any]:
+    """Flatten one /api/tags entry into the fields worth filtering on"""
+    details = model.get("details") or {}
+    size = model.get("size") or 0
+    return {
+        "name": model.get("name"),
+        "family": details.get("family"),
+        "families": details.get("families") or [],
+        "format": details.get("format"),
+        "parameter_size": details.get("parameter_size"),
+        "parameters": parse_parameter_count(details.get("parameter_size")),
+        "quantization": details.get("quantization_level"),
+        "size": size,
+        "size_gb": round(size / 1024 ** 3, 2),
+        "modified_at": model.get("modified_at"),
+    }
+
+
+class CatalogSnapshot:
+    """One fetched model list, serialized and described once"""
+
+    def __init__(self, data: Dict[str, Any], fetched_at: float):
+        self.models: List[Dict[str, Any]] = data.get("models", [])
+        self.body = json.dumps(data, separators=(",", ":")).encode("utf-8")
+        self.etag = '"' + hashlib.sha1(self.body).hexdigest() + '"'
+        self.described = [describe_model(model) for model in self.models]
+        self.fetched_at = fetched_at
+
+
+class ModelCatalog:
+    """
+    In-memory copy of the installed models.
+
+    A snapshot younger than ``ttl`` is served as-is. An older one is still
+    served for up to ``max_stale`` more seconds while a background refresh
+    runs (stale-while-revalidate), and is kept as a fallback if Ollama cannot
+    be reached. Concurrent refreshes share one upstream call, and with
+    several workers a list fetched by one of them within ``ttl`` is reused
+    by the others through ``shared``.
+    """
+
+    def __init__(self, ttl: float, max_stale: float, shared: Optional[SharedState] = None):
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.shared = shared
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._refresh: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.stale_hits = 0
+        self.refreshes = 0
+        self.shared_refreshes = 0
+        self.errors = 0
+
+    async def get(self, loader: Callable[[], Awaitable[Dict[str, Any]]]) -> CatalogSnapshot:
+        """The current snapshot, fetching it with ``loader`` when missing or too old"""
+        snapshot = self._snapshot
+        if snapshot is not None:
+            age = time.monotonic() - snapshot.fetched_at
+            if age < self.ttl:
+                self.hits += 1
+                return snapshot
+            if age < self.ttl + self.max_stale:
+                self._start_refresh(loader)
+                self.stale_hits += 1
+                return snapshot
+        try:
+            # Shielded so a caller going away does not cancel the shared refresh
+            return await asyncio.shield(self._start_refresh(loader))
+        except Exception:
+            if snapshot is None:
+                raise
+            return snapshot
+
+    def invalidate(self) -> None:
+        """Force the next ``get`` to fetch a fresh list"""
+        self._snapshot = None
+
+    def _start_refresh(self, loader: Callable[[], Awaitable[Dict[str, Any]]]) -> asyncio.Task:
+        if self._refresh is None:
+            self._refresh = asyncio.create_task(self._load(loader))
+            self._refresh.add_done_callback(self._refresh_done)
+        return self._refresh
+
+    async def _load(self, loader: Callable[[], Awaitable[Dict[str, Any]]]) -> CatalogSnapshot:
+        snapshot = await self._load_shared()
+        if snapshot is None:
+            snapshot = CatalogSnapshot(await loader(), time.monotonic())
+            self.refreshes += 1
+            if self.shared is not None:
+                await self.shared.put(SHARED_KEY, snapshot.body)
+        self._snapshot = snapshot
+        return snapshot
+
+    async def _load_shared(self) -> Optional[CatalogSnapshot]:
+        """A list another worker fetched within the TTL, if there is one"""
+        if self.shared is None:
+            return None
+        record = await self.shared.get(SHARED_KEY)
+        if record is None:
+            return None
+        body, age = record
+        if age >= self.ttl:
+            return None
+        self.shared_refreshes += 1
+        return CatalogSnapshot(json.loads(body), time.monotonic() - age)
+
+    def _refresh_done(self, task: asyncio.Task) -> None:
+        self._refresh = None
+        if not task.cancelled() and task.exception() is not None:
+            self.errors += 1
+            logger.warning(f"Failed to refresh model catalogue: {str(task.exception())}")
+
+    def stats(self) -> Dict[str, Any]:
+        snapshot = self._snapshot
+        return {
+            "models": len(snapshot.models) if snapshot else 0,
+            "age": round(time.monotonic() - snapshot.fetched_at, 1) if snapshot else None,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "refreshes": self.refreshes,
+            "shared_refreshes": self.shared_refreshes,
+            "errors": self.errors,
+        }
+
+
+# Global model catalogue instance
+model_catalog = ModelCatalog(
+    ttl=get_settings().MODEL_CATALOG_TTL,
+    max_stale=get_settings().MODEL_CATALOG_MAX_STALE,
+    shared=shared_state,
+)
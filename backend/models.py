@@ -0,0 +1,41 @@
+from typing import Any, List, Optional, Union
+
+from pydantic import BaseModel, Field
+
+
+class Message(BaseModel):
+    role: str = Field(..., description="The role of the message sender (user/assistant/system)")
+    content: str = Field(..., description="The content of the message")
+
+class ChatRequest(BaseModel):
+    model: str = Field(..., description="The model to use for generation")
+    messages: List[Message] = Field(..., description="List of messages in the conversation")
+    stream: bool = Field(False, description="Whether to stream the response")
+    temperature: Optional[float] = Field(0.7, ge=0.0, le=2.0, description="Sampling temperature")
+    max_tokens: Optional[int] = Field(None, ge=1, description="Maximum number of tokens to generate")
+    keep_alive: Optional[Union[str, int]] = Field(None, description="How long Ollama keeps the model loaded afterwards (e.g. \"10m\", -1); defaults to the server's policy")
+
+class ChatBatchRequest(BaseModel):
+    # Items are validated one by one as they run, so a bad one fails alone
+    requests: List[Any] = Field(
+        ...,
+        min_length=1,
+        description="/api/chat request bodies to run; each reply arrives whole, streaming is ignored"
+    )
+    concurrency: Optional[int] = Field(None, ge=1, description="Requests sent to Ollama at once; capped by the server's CHAT_BATCH_CONCURRENCY")
+
+class ModelWarmRequest(BaseModel):
+    model: str = Field(..., description="The model to load into memory")
+    keep_alive: Optional[Union[str, int]] = Field(None, description="How long to keep it loaded; defaults to the server's policy")
+
+class SessionCreateRequest(BaseModel):
+    model: str = Field(..., description="The model used for the session's turns")
+    messages: List[Message] = Field(default_factory=list, description="History to seed the session with")
+    context_tokens: Optional[int] = Field(None, ge=1, description="Prompt token budget; older turns are trimmed to fit")
+
+class SessionChatRequest(BaseModel):
+    message: Message = Field(..., description="The new message for this turn")
+    model: Optional[str] = Field(None, description="Overrides the session's model for this turn")
+    stream: bool = Field(False, description="Whether to stream the response")
+    temperature: Optional[float] = Field(0.7, ge=0.0, le=2.0, description="Sampling temperature")
+    max_tokens: Optional[int] = Field(None, ge=1, description="Maximum number of tokens to generate")
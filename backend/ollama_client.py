@@ -0,0 +1,202 @@
+import asyncio
+import json
+import time
+from typing import Any, AsyncGenerator, Awaitable, Dict, Optional, TypeVar, Union
+
+import anyio
+import httpx
+from fastapi import Request
+from fastapi.responses import Response
+from loguru import logger
+
+from config import Settings
+from metrics import observe_generation, ollama_time_to_first_token
+
+T = TypeVar("T")
+
+# Headers that stop intermediaries from buffering server-sent events
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",
+}
+
+
+# Content type for payloads that are already serialized to JSON bytes
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+
+class ClientDisconnected(Exception):
+    """Raised when the browser goes away before Ollama has answered"""
+
+
+def build_timeout(settings: Settings) -> httpx.Timeout:
+    """
+    Map the connect/first-byte settings onto httpx.
+
+    httpx applies ``read`` to every socket read, so it bounds the wait for the
+    first byte; the tighter inter-token limit is enforced by ``iter_lines``.
+    """
+    return httpx.Timeout(
+        connect=settings.OLLAMA_CONNECT_TIMEOUT,
+        read=settings.OLLAMA_FIRST_BYTE_TIMEOUT,
+        write=settings.OLLAMA_CONNECT_TIMEOUT,
+        pool=settings.OLLAMA_CONNECT_TIMEOUT,
+    )
+
+
+def create_ollama_client(settings: Settings, base_url: Optional[str] = None) -> httpx.AsyncClient:
+    """Build the long-lived, pooled HTTP client for one Ollama server (default OLLAMA_BASE_URL)"""
+    limits = httpx.Limits(
+        max_connections=settings.OLLAMA_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.OLLAMA_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=settings.OLLAMA_KEEPALIVE_EXPIRY,
+    )
+    return httpx.AsyncClient(
+        base_url=base_url or settings.OLLAMA_BASE_URL,
+        limits=limits,
+        http2=settings.OLLAMA_HTTP2,
+        timeout=build_timeout(settings),
+    )
+
+
+async def wait_for_disconnect(request: Request) -> None:
+    """
+    Block until the ASGI server reports that the client went away.
+
+    The request body has already been consumed by the time an endpoint runs,
+    so the only message left to receive is ``http.disconnect``. This is used
+    instead of ``Request.is_disconnected()``, whose non-blocking check never
+    sees the disconnect through the ``log_requests`` middleware.
+    """
+    while True:
+        message = await request.receive()
+        if message["type"] == "http.disconnect":
+            return
+
+
+async def cancel_on_disconnect(request: Request, awaitable: Awaitable[T]) -> T:
+    """
+    Await an upstream call, abandoning it as soon as the client disconnects.
+
+    Cancelling the task drops the connection to Ollama, which makes Ollama
+    stop generating instead of finishing a reply nobody will read.
+    """
+    task = asyncio.ensure_future(awaitable)
+    watcher = asyncio.ensure_future(wait_for_disconnect(request))
+    try:
+        await asyncio.wait({task, watcher}, return_when=asyncio.FIRST_COMPLETED)
+        if task.done():
+            return task.result()
+        raise ClientDisconnected()
+    finally:
+        for pending in (task, watcher):
+            if not pending.done():
+                pending.cancel()
+                try:
+                    await pending
+                except BaseException:
+                    pass
+
+
+def passthrough(response: httpx.Response, headers: Optional[Dict[str, str]] = None) -> Response:
+    """
+    Forward an Ollama response body as-is.
+
+    Returning the parsed dict instead would make FastAPI run it through
+    ``jsonable_encoder`` and serialize it again, for an identical body.
+    """
+    return Response(
+        content=response.content,
+        status_code=response.status_code,
+        media_type=response.headers.get("content-type", "application/json"),
+        headers=headers,
+    )
+
+
+async def open_stream(
+    client: httpx.AsyncClient,
+    path: str,
+    payload: Union[bytes, Dict[str, Any]]
+) -> httpx.Response:
+    """
+    Send a streaming POST to Ollama and return the response once headers arrive.
+
+    ``payload`` is either a dict or an already serialized JSON body. Upstream
+    error statuses are raised as ``httpx.HTTPStatusError`` before any body is
+    forwarded, so callers can still answer with a proper HTTP error.
+    """
+    if isinstance(payload, bytes):
+        upstream_request = client.build_request("POST", path, content=payload, headers=JSON_HEADERS)
+    else:
+        upstream_request = client.build_request("POST", path, json=payload)
+    response = await client.send(upstream_request, stream=True)
+    if response.is_error:
+        await response.aread()
+        await response.aclose()
+        response.raise_for_status()
+    return response
+
+
+async def iter_lines(response: httpx.Response, inter_token_timeout: float) -> AsyncGenerator[str, None]:
+    """
+    Yield the non-empty NDJSON lines of a streaming Ollama response.
+
+    The first line is bounded by the client's first-byte timeout; every later
+    line must follow within ``inter_token_timeout`` or ``asyncio.TimeoutError``
+    is raised.
+    """
+    lines = response.aiter_lines()
+    first_line = True
+    while True:
+        try:
+            if first_line:
+                line = await lines.__anext__()
+            else:
+                line = await asyncio.wait_for(lines.__anext__(), inter_token_timeout)
+        except StopAsyncIteration:
+            return
+        if line:
+            first_line = False
+            # Only the final line carries the generation stats
+            if '"eval_count"' in line:
+                observe_generation(line.encode("utf-8"))
+            yield line
+
+
+async def relay_as_sse(
+    lines: AsyncGenerator[str, None],
+    label: str,
+    start_time: Optional[float]
+) -> AsyncGenerator[str, None]:
+    """
+    Forward Ollama's NDJSON lines as SSE events as soon as each one arrives.
+
+    The generator only pulls the next line from ``lines`` once the previous
+    event has been handed to the ASGI server, so a slow browser throttles the
+    upstream read instead of piling tokens up in memory. ``start_time`` is the
+    ``time.perf_counter()`` reading taken before the upstream request was sent,
+    or None for lines that did not come from a call of their own (cache
+    replays), which record no time to first token.
+
+    When the browser disconnects Starlette cancels this generator; ``lines``
+    is then closed so the upstream call can be dropped.
+    """
+    first_token = start_time is not None
+    try:
+        async for line in lines:
+            if first_token:
+                first_token = False
+                ttft = time.perf_counter() - start_time
+                ollama_time_to_first_token.observe(ttft, label)
+                logger.debug("{} time to first token: {:.2f}ms", label, ttft * 1000)
+            yield f"data: {line}\n\n"
+    except asyncio.TimeoutError:
+        logger.error(f"{label} stream stalled between tokens")
+        yield f"data: {json.dumps({'error': 'Ollama stopped producing tokens', 'done': True})}\n\n"
+    except httpx.HTTPError as e:
+        logger.error(f"{label} stream interrupted: {str(e)}")
+        yield f"data: {json.dumps({'error': str(e) or type(e).__name__, 'done': True})}\n\n"
+    finally:
+        # Shielded so the close still runs while the request is being cancelled
+        with anyio.CancelScope(shield=True):
+            await lines.aclose()
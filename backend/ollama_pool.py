@@ -0,0 +1,412 @@
+import asyncio
+import itertools
+import json
+import math
+import random
+import time
+from typing import Any, Dict, List, Optional, Set, Union
+
+import httpx
+from fastapi import Request
+from loguru import logger
+
+from config import Settings, get_settings
+from ollama_client import create_ollama_client
+from shared_state import SharedState, shared_state
+
+
+def keep_alive_for(model: str) -> Optional[Union[str, int]]:
+    """The configured keep_alive for ``model``: by full name, then by name without the tag"""
+    settings = get_settings()
+    policy = settings.OLLAMA_MODEL_KEEP_ALIVE
+    if model in policy:
+        return policy[model]
+    base_name = model.split(":", 1)[0]
+    return policy.get(base_name, settings.OLLAMA_KEEP_ALIVE)
+
+
+def is_node_failure(error: Optional[BaseException]) -> bool:
+    """Errors that say something about the node rather than the request"""
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code >= 500
+    # A stream that stalls between tokens (see ``iter_lines``) counts as well
+    return isinstance(error, (httpx.TransportError, asyncio.TimeoutError))
+
+
+class OllamaUnavailable(Exception):
+    """Raised when every Ollama node is known to be down; carries a Retry-After hint"""
+
+    def __init__(self, retry_after: int):
+        super().__init__("Ollama service unavailable")
+        self.retry_after = retry_after
+
+
+# Circuit breaker states of a node
+CLOSED = "closed"  # in rotation
+OPEN = "open"  # ejected; calls fail fast until the cooldown ends
+HALF_OPEN = "half_open"  # one trial call decides whether the node comes back
+
+
+class OllamaNode:
+    """One Ollama server in the pool, with its circuit breaker"""
+
+    def __init__(self, url: str, client: httpx.AsyncClient):
+        self.url = url
+        self.client = client
+        self.outstanding = 0
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.failures = 0
+        self.last_probe: Optional[float] = None
+        # Models in memory (from /api/ps) and installed (from /api/tags)
+        self.loaded_models: Set[str] = set()
+        self.models: Set[str] = set()
+        self.tags: List[Dict[str, Any]] = []
+        self.last_error: Optional[str] = None
+
+    @property
+    def healthy(self) -> bool:
+        return self.state == CLOSED
+
+
+class NodeLease:
+    """
+    A request routed to a node; release it exactly once when the call ends.
+
+    Also usable as a context manager, which releases with whatever exception
+    left the block.
+    """
+
+    def __init__(self, pool: "OllamaPool", node: OllamaNode, model: Optional[str], trial: bool = False):
+        self._pool = pool
+        self.node = node
+        self.model = model
+        # The half-open trial call for a node whose breaker is open
+        self.trial = trial
+        self._released = False
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        return self.node.client
+
+    def release(self, error: Optional[BaseException] = None) -> None:
+        if not self._released:
+            self._released = True
+            self._pool._release(self, error)
+
+    def __enter__(self) -> "NodeLease":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.release(exc)
+
+
+class OllamaPool:
+    """
+    Routes Ollama calls across several servers.
+
+    A call goes to the healthy node with the fewest outstanding requests,
+    preferring nodes that already hold the model in memory, then nodes that
+    have it installed, so requests avoid paying for a model load elsewhere.
+
+    A background task probes every node's ``/api/ps`` and ``/api/tags``, so
+    health is known without putting probe traffic on the request path. Each
+    node has a circuit breaker: failing a probe, refusing a connection, or
+    failing ``max_failures`` calls in a row opens it. While every breaker is
+    open, calls fail at once with ``OllamaUnavailable`` instead of waiting
+    on connect timeouts. Once ``cooldown`` has passed, a single trial call is
+    let through (half-open); its success, or a successful probe, closes the
+    breaker again.
+
+    With several workers, probe results are published through ``shared``;
+    a worker whose probe is due adopts a result another worker published
+    within the last half interval instead of probing the node itself.
+    """
+
+    def __init__(
+        self,
+        nodes: List[OllamaNode],
+        probe_interval: float,
+        max_failures: int,
+        cooldown: float = 5.0,
+        shared: Optional[SharedState] = None
+    ):
+        self.nodes = nodes
+        self.probe_interval = probe_interval
+        self.max_failures = max_failures
+        self.cooldown = cooldown
+        self.shared = shared
+        self._rotation = itertools.count()
+        self._prober: Optional[asyncio.Task] = None
+        # Set once every node has been probed, for the readiness check
+        self.probed = False
+        self._warming: Dict[str, asyncio.Task] = {}
+
+    @property
+    def healthy(self) -> bool:
+        return any(node.healthy for node in self.nodes)
+
+    def ensure_available(self) -> None:
+        """Raise ``OllamaUnavailable`` now if a call could not be routed anywhere"""
+        if not self.healthy:
+            self._raise_unless_trial_due(time.monotonic())
+
+    def checkout(self, model: Optional[str] = None) -> NodeLease:
+        """
+        Pick the node for a call to ``model`` and count it as outstanding.
+
+        Raises ``OllamaUnavailable`` when no node can take the call.
+        """
+        candidates = [node for node in self.nodes if node.healthy]
+        if not candidates:
+            return self._checkout_trial(model)
+        if model:
+            candidates = (
+                [node for node in candidates if model in node.loaded_models]
+                or [node for node in candidates if model in node.models]
+                or candidates
+            )
+        # Rotate the starting point so ties do not all land on the first node
+        offset = next(self._rotation) % len(candidates)
+        rotated = candidates[offset:] + candidates[:offset]
+        node = min(rotated, key=lambda candidate: candidate.outstanding)
+        node.outstanding += 1
+        return NodeLease(self, node, model)
+
+    def _checkout_trial(self, model: Optional[str]) -> NodeLease:
+        now = time.monotonic()
+        ready = [
+            node for node in self.nodes
+            if node.state == OPEN and now - node.opened_at >= self.cooldown
+        ]
+        if not ready:
+            self._raise_unless_trial_due(now)
+        node = ready[0]
+        node.state = HALF_OPEN
+        node.outstanding += 1
+        logger.info(f"Sending trial request to Ollama node {node.url}")
+        return NodeLease(self, node, model, trial=True)
+
+    def _raise_unless_trial_due(self, now: float) -> None:
+        """Raise ``OllamaUnavailable`` unless some open node is due a trial call"""
+        waits = [
+            self.cooldown - (now - node.opened_at)
+            for node in self.nodes if node.state == OPEN
+        ]
+        if any(wait <= 0 for wait in waits):
+            return
+        # Either cooling down or a trial is already in flight
+        raise OllamaUnavailable(max(1, math.ceil(min(waits, default=self.cooldown))))
+
+    def _release(self, lease: NodeLease, error: Optional[BaseException]) -> None:
+        node = lease.node
+        node.outstanding -= 1
+        if is_node_failure(error):
+            node.failures += 1
+            if isinstance(error, httpx.ConnectError):
+                # Nothing is listening; no point sending it more requests
+                node.failures = max(node.failures, self.max_failures)
+            node.last_error = str(error) or type(error).__name__
+            if lease.trial or (node.healthy and node.failures >= self.max_failures):
+                self._open(node)
+        elif error is None:
+            node.failures = 0
+            if lease.trial:
+                self._close(node)
+            if lease.model:
+                # Ollama keeps the model loaded after serving it
+                node.loaded_models.add(lease.model)
+        elif lease.trial and node.state == HALF_OPEN:
+            # Cancelled or a client error: the trial proved nothing, retry later
+            node.state = OPEN
+
+    def _open(self, node: OllamaNode) -> None:
+        if node.state != OPEN:
+            logger.warning(f"Ejecting Ollama node {node.url}: {node.last_error}")
+        node.state = OPEN
+        node.opened_at = time.monotonic()
+
+    def _close(self, node: OllamaNode) -> None:
+        if node.state != CLOSED:
+            logger.info(f"Re-admitting Ollama node {node.url}")
+        node.state = CLOSED
+        node.failures = 0
+        node.last_error = None
+
+    async def start(self) -> None:
+        """
+        Start probing every node in the background.
+
+        Startup does not wait for the first probes; until they are back,
+        nodes are assumed healthy and ``probed`` stays false.
+        """
+        self._prober = asyncio.create_task(self._probe_forever())
+
+    async def close(self) -> None:
+        for task in list(self._warming.values()):
+            task.cancel()
+        if self._prober is not None:
+            self._prober.cancel()
+            await asyncio.gather(self._prober, return_exceptions=True)
+            self._prober = None
+        await asyncio.gather(*(node.client.aclose() for node in self.nodes))
+
+    async def probe_all(self) -> None:
+        await asyncio.gather(*(self._probe(node) for node in self.nodes))
+
+    async def _probe_forever(self) -> None:
+        while True:
+            await self.probe_all()
+            self.probed = True
+            # Jittered so workers started together do not all probe at once
+            await asyncio.sleep(self.probe_interval * random.uniform(0.9, 1.1))
+
+    async def _probe(self, node: OllamaNode) -> None:
+        key = f"ollama_probe:{node.url}"
+        if self.shared is not None:
+            record = await self.shared.get(key)
+            if record is not None and record[1] < self.probe_interval / 2:
+                self._apply_probe(node, json.loads(record[0]))
+                return
+
+        result: Dict[str, Any] = {"at": time.time()}
+        try:
+            ps, tags = await asyncio.gather(
+                node.client.get("/api/ps", timeout=5.0),
+                node.client.get("/api/tags", timeout=5.0),
+            )
+            ps.raise_for_status()
+            tags.raise_for_status()
+            result["loaded_models"] = [m["name"] for m in ps.json().get("models", [])]
+            result["tags"] = tags.json().get("models", [])
+        except (httpx.HTTPError, ValueError) as e:
+            result["error"] = f"probe failed: {str(e) or type(e).__name__}"
+        self._apply_probe(node, result)
+        if self.shared is not None:
+            await self.shared.put(key, json.dumps(result).encode("utf-8"))
+
+    def _apply_probe(self, node: OllamaNode, result: Dict[str, Any]) -> None:
+        node.last_probe = result["at"]
+        if "error" in result:
+            node.last_error = result["error"]
+            if node.state != HALF_OPEN:
+                self._open(node)
+            return
+        node.loaded_models = set(result["loaded_models"])
+        node.tags = result["tags"]
+        node.models = {m["name"] for m in node.tags}
+        self._close(node)
+
+    async def merged_tags(self) -> Dict[str, Any]:
+        """Installed models across the pool, each listed once"""
+        nodes = [node for node in self.nodes if node.healthy]
+        if not nodes:
+            raise OllamaUnavailable(max(1, math.ceil(self.cooldown)))
+        responses = await asyncio.gather(
+            *(node.client.get("/api/tags") for node in nodes),
+            return_exceptions=True
+        )
+        models: Dict[str, Dict[str, Any]] = {}
+        errors = []
+        for node, response in zip(nodes, responses):
+            if isinstance(response, BaseException):
+                errors.append(response)
+                continue
+            try:
+                response.raise_for_status()
+            except httpx.HTTPStatusError as e:
+                errors.append(e)
+                continue
+            node.tags = response.json().get("models", [])
+            node.models = {m["name"] for m in node.tags}
+            for model in node.tags:
+                models.setdefault(model["name"], model)
+        if errors and len(errors) == len(nodes):
+            raise errors[0]
+        return {"models": list(models.values())}
+
+    def resident(self, model: str) -> bool:
+        """Whether ``model`` is loaded on some healthy node"""
+        return any(model in node.loaded_models for node in self.nodes if node.healthy)
+
+    def resident_models(self) -> Dict[str, List[str]]:
+        """Loaded models and the nodes holding them"""
+        resident: Dict[str, List[str]] = {}
+        for node in self.nodes:
+            if node.healthy:
+                for model in sorted(node.loaded_models):
+                    resident.setdefault(model, []).append(node.url)
+        return resident
+
+    def warm(self, model: str, keep_alive: Optional[Union[str, int]] = None) -> asyncio.Task:
+        """
+        Load ``model`` on the node that would serve it, in the background.
+
+        Repeated calls while a load is running share it.
+        """
+        task = self._warming.get(model)
+        if task is None:
+            task = asyncio.create_task(self._load_model(model, keep_alive))
+            self._warming[model] = task
+            task.add_done_callback(lambda done: self._warm_done(model, done))
+        return task
+
+    def _warm_done(self, model: str, task: asyncio.Task) -> None:
+        self._warming.pop(model, None)
+        if not task.cancelled():
+            # Already logged; retrieved so unawaited failures are not reported again
+            task.exception()
+
+    def warming(self, model: str) -> bool:
+        return model in self._warming
+
+    async def _load_model(self, model: str, keep_alive: Optional[Union[str, int]]) -> None:
+        # A generate call without a prompt only loads the model
+        payload: Dict[str, Any] = {"model": model}
+        if keep_alive is None:
+            keep_alive = keep_alive_for(model)
+        if keep_alive is not None:
+            payload["keep_alive"] = keep_alive
+        start_time = time.perf_counter()
+        try:
+            with self.checkout(model) as lease:
+                response = await lease.client.post("/api/generate", json=payload)
+                response.raise_for_status()
+        except Exception as e:
+            logger.warning(f"Failed to load model {model}: {str(e) or type(e).__name__}")
+            raise
+        logger.info(f"Loaded model {model} on {lease.node.url} in {time.perf_counter() - start_time:.1f}s")
+
+    def stats(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                "url": node.url,
+                "healthy": node.healthy,
+                "state": node.state,
+                "outstanding": node.outstanding,
+                "failures": node.failures,
+                "loaded_models": sorted(node.loaded_models),
+                "models": len(node.models),
+                "last_error": node.last_error,
+                "last_probe": node.last_probe,
+            }
+            for node in self.nodes
+        ]
+
+
+def create_ollama_pool(settings: Settings) -> OllamaPool:
+    """One pooled client per configured Ollama server"""
+    urls = settings.OLLAMA_BASE_URLS or [settings.OLLAMA_BASE_URL]
+    nodes = [OllamaNode(url, create_ollama_client(settings, url)) for url in urls]
+    return OllamaPool(
+        nodes,
+        probe_interval=settings.OLLAMA_PROBE_INTERVAL,
+        max_failures=settings.OLLAMA_MAX_NODE_FAILURES,
+        cooldown=settings.OLLAMA_BREAKER_COOLDOWN,
+        shared=shared_state,
+    )
+
+
+def get_ollama_pool(request: Request) -> OllamaPool:
+    """FastAPI dependency returning the pool created in the app lifespan"""
+    return request.app.state.ollama_pool
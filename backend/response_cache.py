@@ -0,0 +1,274 @@
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Any, AsyncGenerator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from fastapi import Request
+
+from config import get_settings
+from models import ChatRequest
+
+# Values of the X-Cache response header
+CACHE_HIT = "HIT"
+CACHE_MISS = "MISS"
+CACHE_COALESCED = "COALESCED"
+
+
+def is_cacheable(chat_request: ChatRequest, request: Request) -> bool:
+    """
+    Only deterministic requests are served from the cache.
+
+    Callers can opt out per request with ``X-Cache-Bypass: 1`` or
+    ``Cache-Control: no-cache``.
+    """
+    if chat_request.temperature != 0:
+        return False
+    if request.headers.get("X-Cache-Bypass", "").lower() in ("1", "true", "yes"):
+        return False
+    cache_control = request.headers.get("Cache-Control", "").lower()
+    return "no-cache" not in cache_control and "no-store" not in cache_control
+
+
+class _Call:
+    """One upstream call shared by every identical request waiting on it"""
+
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class _Stream:
+    """
+    One upstream stream fanned out to several subscribers.
+
+    Lines are kept for the lifetime of the stream so late subscribers replay
+    from the start, then follow along live.
+    """
+
+    def __init__(self, key: str):
+        self.key = key
+        self.lines: List[str] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+
+    def notify(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def wait_started(self) -> None:
+        """Wait for the first line, re-raising an upstream failure that came first"""
+        while not self.lines and not self.done:
+            await self._changed.wait()
+        if self.error is not None and not self.lines:
+            raise self.error
+
+    async def follow(self) -> AsyncGenerator[str, None]:
+        index = 0
+        while True:
+            while index < len(self.lines):
+                yield self.lines[index]
+                index += 1
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            await self._changed.wait()
+
+
+class ResponseCache:
+    """
+    Exact-match cache for deterministic Ollama calls.
+
+    Complete responses are kept in a TTL-bounded LRU keyed by a canonical
+    hash of the request. Identical requests that arrive while the first one
+    is still running share its upstream call instead of starting their own;
+    streams are fanned out to every subscriber as the tokens arrive. The
+    shared call is cancelled once nobody is waiting for it any more.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._calls: Dict[str, _Call] = {}
+        self._streams: Dict[str, _Stream] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    @staticmethod
+    def make_key(path: str, payload: bytes) -> str:
+        """
+        Hash the endpoint and serialized request into a cache key.
+
+        ``payload`` must come from ``model_dump_json``, which emits fields in
+        declaration order, so equal requests always produce equal bytes.
+        """
+        return hashlib.sha256(path.encode("utf-8") + b"\0" + payload).hexdigest()
+
+    async def fetch(
+        self,
+        key: str,
+        producer: Callable[[], Awaitable[Any]]
+    ) -> Tuple[Any, str]:
+        """Return ``(response, cache status)``, calling ``producer`` only on a miss"""
+        value = self._get(key)
+        if value is not None:
+            self.hits += 1
+            return value, CACHE_HIT
+
+        call = self._calls.get(key)
+        if call is None:
+            self.misses += 1
+            status = CACHE_MISS
+            call = _Call(asyncio.create_task(producer()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda task: self._finish_call(key, call))
+        else:
+            self.coalesced += 1
+            status = CACHE_COALESCED
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task), status
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                # Nobody is left to read it; later arrivals start afresh
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+                call.task.cancel()
+
+    async def stream(
+        self,
+        key: str,
+        producer: Callable[[], AsyncGenerator[str, None]]
+    ) -> Tuple[AsyncGenerator[str, None], str]:
+        """
+        Return ``(lines, cache status)`` for a streaming call.
+
+        Resolves once the first line is available, so upstream errors can
+        still be reported with an HTTP status.
+        """
+        lines = self._get(key)
+        if lines is not None:
+            self.hits += 1
+            return self._replay(lines), CACHE_HIT
+
+        shared = self._streams.get(key)
+        if shared is None:
+            self.misses += 1
+            status = CACHE_MISS
+            shared = _Stream(key)
+            self._streams[key] = shared
+            shared.task = asyncio.create_task(self._run_stream(shared, producer))
+        else:
+            self.coalesced += 1
+            status = CACHE_COALESCED
+
+        shared.subscribers += 1
+        try:
+            await shared.wait_started()
+        except BaseException:
+            self._unsubscribe(shared)
+            raise
+        return self._subscribe(shared), status
+
+    def stats(self) -> Dict[str, int]:
+        """Hit/miss counters and the number of shared calls in flight"""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "entries": len(self._entries),
+            "in_flight": len(self._calls) + len(self._streams),
+        }
+
+    def _get(self, key: str) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _put(self, key: str, value: Any) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _finish_call(self, key: str, call: _Call) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+        # Always retrieve the exception so abandoned calls do not warn
+        if not call.task.cancelled() and call.task.exception() is None:
+            self._put(key, call.task.result())
+
+    async def _run_stream(
+        self,
+        shared: _Stream,
+        producer: Callable[[], AsyncGenerator[str, None]]
+    ) -> None:
+        lines = producer()
+        try:
+            async for line in lines:
+                shared.lines.append(line)
+                shared.notify()
+            if _is_complete(shared.lines):
+                self._put(shared.key, list(shared.lines))
+        except Exception as e:
+            shared.error = e
+        finally:
+            await lines.aclose()
+            shared.done = True
+            shared.notify()
+            if self._streams.get(shared.key) is shared:
+                del self._streams[shared.key]
+
+    async def _subscribe(self, shared: _Stream) -> AsyncGenerator[str, None]:
+        try:
+            async for line in shared.follow():
+                yield line
+        finally:
+            self._unsubscribe(shared)
+
+    def _unsubscribe(self, shared: _Stream) -> None:
+        shared.subscribers -= 1
+        if shared.subscribers == 0 and shared.task is not None and not shared.task.done():
+            if self._streams.get(shared.key) is shared:
+                del self._streams[shared.key]
+            shared.task.cancel()
+
+    @staticmethod
+    async def _replay(lines: List[str]) -> AsyncGenerator[str, None]:
+        for line in lines:
+            yield line
+
+
+def _is_complete(lines: List[str]) -> bool:
+    """A stream is only worth caching if Ollama finished it without an error"""
+    if not lines:
+        return False
+    try:
+        last = json.loads(lines[-1])
+    except ValueError:
+        return False
+    return bool(last.get("done")) and "error" not in last
+
+
+# Global response cache instance
+response_cache = ResponseCache(
+    max_entries=get_settings().RESPONSE_CACHE_MAX_ENTRIES,
+    ttl=get_settings().RESPONSE_CACHE_TTL,
+)
@@ -0,0 +1,46 @@
+from fastapi import APIRouter, HTTPException, Query
+from typing import Any, Awaitable, Dict, Optional
+
+from conversation_store import conversation_store
+
+router = APIRouter(prefix="/api/conversations", tags=["Conversations"])
+
+async def _page(query: Awaitable[Dict[str, Any]]) -> Dict[str, Any]:
+    try:
+        return await query
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+@router.get("")
+async def list_conversations(
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None
+):
+    """
+    List stored conversations, most recently updated first.
+
+    Pass the returned ``next_cursor`` back to fetch the next page.
+    """
+    return await _page(conversation_store.list_conversations(limit, cursor))
+
+@router.get("/search")
+async def search_messages(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None
+):
+    """
+    Full-text search across every stored message, newest matches first
+    """
+    return await _page(conversation_store.search(q, limit, cursor))
+
+@router.get("/{conversation_id}/messages")
+async def list_messages(
+    conversation_id: str,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None
+):
+    """
+    A conversation's messages, oldest first
+    """
+    return await _page(conversation_store.list_messages(conversation_id, limit, cursor))
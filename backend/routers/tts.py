@@ -1,10 +1,18 @@
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import StreamingResponse
+import hashlib
+from urllib.parse import urlencode
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import Response, StreamingResponse
+from loguru import logger
 from pydantic import BaseModel
-from typing import Optional
-import edge_tts
-import asyncio
-import io
+from typing import AsyncGenerator, AsyncIterator, Dict, List, Optional
+
+from config import get_settings
+from http_utils import etag_matches
+from tts_cache import tts_cache
+from tts_segments import split_segments, stream_segments
+from tts_service import stream_speech
+from voice_catalog import voice_catalog
 
 router = APIRouter(prefix="/api/tts", tags=["TTS"])
 
@@ -14,57 +22,202 @@ class TTSRequest(BaseModel):
     rate: str = "+0%"
     volume: str = "+0%"
 
-@router.post("", response_class=StreamingResponse)
-async def text_to_speech(request: TTSRequest):
-    """
-    Convert text to speech using edge-tts
-    """
+def _audio_headers(etag: str, cache_status: str) -> Dict[str, str]:
+    return {
+        "ETag": etag,
+        "Cache-Control": f"private, max-age={get_settings().TTS_CACHE_MAX_AGE}",
+        "X-Cache": cache_status,
+    }
+
+async def _prepend(first_chunk: bytes, rest: AsyncIterator[bytes]) -> AsyncGenerator[bytes, None]:
+    if first_chunk:
+        yield first_chunk
+    async for chunk in rest:
+        yield chunk
+
+def _check_voice(voice: str) -> None:
+    if not voice_catalog.is_valid(voice):
+        # edge-tts would only notice after connecting to the service
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown voice: {voice}"
+        )
+
+async def _cached_speech(tts_request: TTSRequest, if_none_match: Optional[str]) -> Response:
+    """Serve synthesized audio from the cache, synthesizing only on a miss"""
+    _check_voice(tts_request.voice)
+    
+    key = tts_cache.make_key(
+        tts_request.text,
+        tts_request.voice,
+        tts_request.rate,
+        tts_request.volume
+    )
+    etag = f'"{key}"'
+    
+    # The key covers every synthesis input, so a matching ETag means the
+    # browser already holds exactly this audio
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=_audio_headers(etag, "HIT"))
+    
+    audio = await tts_cache.get(key)
+    if audio is not None:
+        return Response(audio, media_type="audio/mpeg", headers=_audio_headers(etag, "HIT"))
+    
     try:
-        print(f"TTS Request: {request.text[:50]}... with voice {request.voice}")
+        logger.debug("TTS request: {}... with voice {}", tts_request.text[:50], tts_request.voice)
         
-        communicate = edge_tts.Communicate(
-            text=request.text,
-            voice=request.voice,
-            rate=request.rate,
-            volume=request.volume
+        audio_stream = stream_speech(
+            tts_request.text,
+            tts_request.voice,
+            tts_request.rate,
+            tts_request.volume
         )
         
-        # Create an in-memory buffer to store the audio
-        audio_buffer = io.BytesIO()
-        
-        # Save the audio to the buffer
-        await communicate.save(audio_buffer)
-        audio_buffer.seek(0)
-        
-        print(f"TTS Success: Generated {len(audio_buffer.getvalue())} bytes")
-        
-        # Return the audio data as a streaming response
-        return StreamingResponse(
-            iter([audio_buffer.getvalue()]),
-            media_type="audio/mpeg"
-        )
+        # Wait for the first chunk only, so synthesis errors still map to a
+        # 500 while the rest of the clip is forwarded as it is produced
+        try:
+            first_chunk = await audio_stream.__anext__()
+        except StopAsyncIteration:
+            first_chunk = b""
         
     except Exception as e:
-        print(f"TTS Error: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"TTS error: {str(e)}")
         raise HTTPException(
             status_code=500,
             detail=f"Failed to generate speech: {str(e)}"
         )
+    
+    return StreamingResponse(
+        _prepend(first_chunk, audio_stream),
+        media_type="audio/mpeg",
+        headers=_audio_headers(etag, "MISS")
+    )
 
-@router.get("/voices")
-async def list_voices(locale: Optional[str] = None):
+@router.post("")
+async def text_to_speech(request: TTSRequest, if_none_match: Optional[str] = Header(None)):
     """
-    List available voices, optionally filtered by locale
+    Convert text to speech using edge-tts
+    """
+    return await _cached_speech(request, if_none_match)
+
+@router.get("")
+async def text_to_speech_get(
+    request: TTSRequest = Depends(),
+    if_none_match: Optional[str] = Header(None)
+):
     """
+    Convert text to speech using edge-tts.
+    
+    Same as the POST endpoint, but cacheable by the browser, which will
+    revalidate with If-None-Match.
+    """
+    return await _cached_speech(request, if_none_match)
+
+def _segments_of(tts_request: TTSRequest) -> List[str]:
+    settings = get_settings()
+    if len(tts_request.text) > settings.TTS_LONG_MAX_CHARS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Text too long: at most {settings.TTS_LONG_MAX_CHARS} characters"
+        )
+    _check_voice(tts_request.voice)
+    return split_segments(tts_request.text, settings.TTS_SEGMENT_MAX_CHARS)
+
+@router.post("/long")
+async def long_text_to_speech(request: TTSRequest, if_none_match: Optional[str] = Header(None)):
+    """
+    Convert long text to speech, sentence by sentence
+    
+    The text is split into sentences, which are synthesized up to
+    TTS_SEGMENT_CONCURRENCY at a time and streamed back in order as one
+    MP3, starting as soon as the first sentence has audio. Repeated
+    sentences are synthesized once, and every sentence goes through the
+    TTS cache. Use /segments to fetch the sentences one by one instead.
+    """
+    segments = _segments_of(request)
+    keys = [tts_cache.make_key(text, request.voice, request.rate, request.volume) for text in segments]
+    etag = '"' + hashlib.sha256(" ".join(keys).encode("ascii")).hexdigest() + '"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"private, max-age={get_settings().TTS_CACHE_MAX_AGE}",
+        "X-TTS-Segments": str(len(segments)),
+    }
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    
+    logger.debug("Long TTS request: {} segments, {} unique", len(segments), len(set(keys)))
+    audio_stream = stream_segments(
+        segments,
+        request.voice,
+        request.rate,
+        request.volume,
+        get_settings().TTS_SEGMENT_CONCURRENCY
+    )
     try:
-        voices = await edge_tts.list_voices()
-        if locale:
-            voices = [v for v in voices if v['Locale'].lower() == locale.lower()]
-        return {"voices": voices}
+        # As for /api/tts, a failure before any audio is still a 500
+        first_chunk = await audio_stream.__anext__()
+    except StopAsyncIteration:
+        first_chunk = b""
     except Exception as e:
+        logger.exception(f"TTS error: {str(e)}")
         raise HTTPException(
             status_code=500,
-            detail=f"Failed to fetch voices: {str(e)}"
+            detail=f"Failed to generate speech: {str(e)}"
         )
+    
+    return StreamingResponse(
+        _prepend(first_chunk, audio_stream),
+        media_type="audio/mpeg",
+        headers=headers
+    )
+
+@router.post("/segments")
+async def text_segments(request: TTSRequest):
+    """
+    Split text the way /long does, without synthesizing it
+    
+    Each segment comes with a GET /api/tts URL and its cache key (the
+    quoted key is that URL's ETag), so clients can fetch, cache and replay
+    sentences one by one. Repeated sentences share a key.
+    """
+    segments = _segments_of(request)
+    result = []
+    for index, text in enumerate(segments):
+        params = {"text": text, "voice": request.voice, "rate": request.rate, "volume": request.volume}
+        result.append({
+            "index": index,
+            "text": text,
+            "key": tts_cache.make_key(text, request.voice, request.rate, request.volume),
+            "url": f"{router.prefix}?{urlencode(params)}",
+        })
+    return {"segments": result, "unique": len({segment["key"] for segment in result})}
+
+@router.get("/cache/stats")
+async def cache_stats():
+    """
+    Hit/miss counters and sizes of the TTS audio cache
+    """
+    return tts_cache.stats()
+
+@router.get("/voices")
+async def list_voices(
+    locale: Optional[str] = None,
+    language: Optional[str] = None,
+    gender: Optional[str] = None
+):
+    """
+    List available voices, optionally filtered by locale (en-US), language
+    (en) and gender (Female/Male)
+    
+    Served from the cached voice catalogue; the live list is fetched from
+    edge-tts in the background at most once per TTS_VOICES_TTL.
+    """
+    return {"voices": voice_catalog.find(locale=locale, language=language, gender=gender)}
+
+@router.get("/voices/stats")
+async def voice_stats():
+    """
+    Size, source (bundled snapshot or live) and age of the voice catalogue
+    """
+    return voice_catalog.stats()
@@ -0,0 +1,226 @@
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, Optional
+
+from starlette.requests import HTTPConnection
+
+from config import get_settings
+from metrics import register_gauge
+
+
+class SchedulerFull(Exception):
+    """Raised when a request cannot even be queued; carries a Retry-After hint"""
+
+    def __init__(self, model: str, retry_after: int):
+        super().__init__(f"Too many queued requests for model {model}")
+        self.model = model
+        self.retry_after = retry_after
+
+
+class Lease:
+    """A granted upstream slot; release it exactly once when the call ends"""
+
+    def __init__(self, scheduler: "OllamaScheduler", model: str):
+        self._scheduler = scheduler
+        self._model = model
+        self._started = time.perf_counter()
+        self._released = False
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self._scheduler._release(self._model, time.perf_counter() - self._started)
+
+
+class _Waiter:
+    __slots__ = ("future", "enqueued_at")
+
+    def __init__(self):
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.enqueued_at = time.perf_counter()
+
+
+class _ModelQueue:
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.active = 0
+        self.depth = 0
+        # Per-client FIFOs served round-robin, so one busy client cannot
+        # starve the others queued for the same model
+        self.clients: "OrderedDict[str, Deque[_Waiter]]" = OrderedDict()
+        self.avg_service_time = 5.0  # seconds, refined as calls complete
+        self.admitted = 0
+        self.rejected = 0
+        self.waits = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+
+
+class OllamaScheduler:
+    """
+    Admission control in front of Ollama.
+
+    Ollama mostly serializes work per model, so each model gets its own
+    concurrency limit and a bounded queue. Queued requests are granted
+    round-robin across client ids; once the queue is full new requests are
+    refused straight away with a Retry-After estimate instead of waiting for
+    the upstream timeout.
+    """
+
+    def __init__(
+        self,
+        default_limit: int,
+        model_limits: Dict[str, int],
+        max_queue_depth: int,
+        max_queue_per_client: int
+    ):
+        self.default_limit = default_limit
+        self.model_limits = model_limits
+        self.max_queue_depth = max_queue_depth
+        self.max_queue_per_client = max_queue_per_client
+        self._models: Dict[str, _ModelQueue] = {}
+
+    def _queue_for(self, model: str) -> _ModelQueue:
+        queue = self._models.get(model)
+        if queue is None:
+            queue = _ModelQueue(self.model_limits.get(model, self.default_limit))
+            self._models[model] = queue
+        return queue
+
+    async def acquire(self, model: str, client_id: str) -> Lease:
+        """Wait for a slot on ``model``; raises ``SchedulerFull`` if the queue is full"""
+        queue = self._queue_for(model)
+        if queue.active < queue.limit and queue.depth == 0:
+            queue.active += 1
+            queue.admitted += 1
+            return Lease(self, model)
+
+        client_queue = queue.clients.get(client_id)
+        if queue.depth >= self.max_queue_depth or (
+            client_queue is not None and len(client_queue) >= self.max_queue_per_client
+        ):
+            queue.rejected += 1
+            raise SchedulerFull(model, self._retry_after(queue))
+
+        waiter = _Waiter()
+        if client_queue is None:
+            client_queue = queue.clients[client_id] = deque()
+        client_queue.append(waiter)
+        queue.depth += 1
+
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Granted just before the cancellation landed: hand the slot on
+                self._release(model, None)
+            else:
+                self._forget(queue, client_id, waiter)
+            raise
+
+        wait_time = time.perf_counter() - waiter.enqueued_at
+        queue.waits += 1
+        queue.wait_time_total += wait_time
+        queue.wait_time_max = max(queue.wait_time_max, wait_time)
+        queue.admitted += 1
+        return Lease(self, model)
+
+    def _forget(self, queue: _ModelQueue, client_id: str, waiter: _Waiter) -> None:
+        client_queue = queue.clients.get(client_id)
+        if client_queue is None or waiter not in client_queue:
+            return
+        client_queue.remove(waiter)
+        queue.depth -= 1
+        if not client_queue:
+            del queue.clients[client_id]
+
+    def _release(self, model: str, service_time: Optional[float]) -> None:
+        queue = self._models[model]
+        queue.active -= 1
+        if service_time is not None:
+            queue.avg_service_time = 0.8 * queue.avg_service_time + 0.2 * service_time
+        self._dispatch(queue)
+
+    def _dispatch(self, queue: _ModelQueue) -> None:
+        while queue.active < queue.limit and queue.clients:
+            client_id, client_queue = next(iter(queue.clients.items()))
+            waiter = client_queue.popleft()
+            queue.depth -= 1
+            if client_queue:
+                queue.clients.move_to_end(client_id)
+            else:
+                del queue.clients[client_id]
+            if waiter.future.done():
+                continue
+            queue.active += 1
+            waiter.future.set_result(None)
+
+    def _retry_after(self, queue: _ModelQueue) -> int:
+        """Seconds until the queue has likely drained enough to take one more request"""
+        return max(1, math.ceil(queue.avg_service_time * (queue.depth + 1) / queue.limit))
+
+    def active_by_model(self) -> Dict[str, int]:
+        return {model: queue.active for model, queue in self._models.items()}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            model: {
+                "limit": queue.limit,
+                "active": queue.active,
+                "queue_depth": queue.depth,
+                "queued_clients": len(queue.clients),
+                "admitted": queue.admitted,
+                "rejected": queue.rejected,
+                "avg_queue_wait_ms": round(queue.wait_time_total / queue.waits * 1000, 2) if queue.waits else 0.0,
+                "max_queue_wait_ms": round(queue.wait_time_max * 1000, 2),
+                "avg_service_time_ms": round(queue.avg_service_time * 1000, 2),
+            }
+            for model, queue in self._models.items()
+        }
+
+
+def get_client_key(request: HTTPConnection) -> str:
+    """
+    Identify the caller for fair queuing and rate limiting.
+
+    ``X-Client-ID`` is only honoured from a trusted proxy; anyone else could
+    send a fresh id with every request and escape the per-client limits.
+    """
+    host = request.client.host if request.client else None
+    if host and host in get_settings().TRUSTED_PROXIES:
+        client_id = request.headers.get("X-Client-ID")
+        if client_id:
+            return client_id
+    return host or "anonymous"
+
+
+def per_worker(limit: int) -> int:
+    """This process's share of a limit meant for the whole host"""
+    return max(1, math.ceil(limit / get_settings().WORKERS))
+
+
+# Global scheduler instance; each worker admits its share of the configured limits
+scheduler = OllamaScheduler(
+    default_limit=per_worker(get_settings().SCHEDULER_MAX_CONCURRENCY_PER_MODEL),
+    model_limits={
+        model: per_worker(limit)
+        for model, limit in get_settings().SCHEDULER_MODEL_CONCURRENCY.items()
+    },
+    max_queue_depth=per_worker(get_settings().SCHEDULER_MAX_QUEUE_DEPTH),
+    max_queue_per_client=get_settings().SCHEDULER_MAX_QUEUE_PER_CLIENT,
+)
+
+register_gauge(
+    "ollama_inflight_requests",
+    "Ollama calls currently holding a scheduler slot",
+    lambda: {(model,): active for model, active in scheduler.active_by_model().items()},
+    ("model",),
+)
+register_gauge(
+    "ollama_queued_requests",
+    "Requests waiting for an Ollama slot",
+    lambda: {(model,): stats["queue_depth"] for model, stats in scheduler.stats().items()},
+    ("model",),
+)
@@ -0,0 +1,189 @@
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
+
+from config import get_settings
+from models import Message
+
+# Rough size of one token in characters, and the per-message framing cost
+# Ollama's chat templates add; close enough to keep a prompt under budget
+CHARS_PER_TOKEN = 4
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(message: Message) -> int:
+    return len(message.content) // CHARS_PER_TOKEN + MESSAGE_OVERHEAD_TOKENS
+
+
+def fit_to_budget(messages: List[Message], max_tokens: int) -> List[Message]:
+    """
+    Drop the oldest turns until the prompt fits in ``max_tokens``.
+
+    System messages and the newest message are always kept; everything else
+    is kept newest first while it fits, so the model sees an unbroken run of
+    the most recent conversation.
+    """
+    if not messages:
+        return messages
+    system = [m for m in messages[:-1] if m.role == "system"]
+    budget = max_tokens - sum(estimate_tokens(m) for m in system) - estimate_tokens(messages[-1])
+
+    kept: List[Message] = []
+    for message in reversed(messages[:-1]):
+        if message.role == "system":
+            continue
+        cost = estimate_tokens(message)
+        if cost > budget:
+            break
+        budget -= cost
+        kept.append(message)
+    kept.reverse()
+    return system + kept + [messages[-1]]
+
+
+class Session:
+    """Conversation state kept server-side between turns"""
+
+    def __init__(
+        self,
+        model: str,
+        messages: List[Message],
+        context_tokens: Optional[int],
+        session_id: Optional[str] = None
+    ):
+        self.id = session_id or uuid.uuid4().hex
+        self.model = model
+        self.messages = messages
+        self.context_tokens = context_tokens
+        self.last_used = time.monotonic()
+        # Bumped on every turn, so workers can tell which copy is newer
+        self.version = 0
+
+    def prompt(self, message: Message) -> List[Message]:
+        """History plus ``message``, trimmed to the session's context budget"""
+        messages = self.messages + [message]
+        if self.context_tokens:
+            messages = fit_to_budget(messages, self.context_tokens)
+        return messages
+
+    def append(self, *messages: Message) -> None:
+        self.messages.extend(messages)
+        self.version += 1
+        max_messages = get_settings().SESSION_MAX_MESSAGES
+        if len(self.messages) > max_messages:
+            # Keep system prompts, drop the oldest turns
+            system = [m for m in self.messages if m.role == "system"]
+            rest = [m for m in self.messages if m.role != "system"]
+            keep = max(max_messages - len(system), 1)
+            self.messages = system + rest[-keep:]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "session_id": self.id,
+            "model": self.model,
+            "context_tokens": self.context_tokens,
+            "messages": [m.dict() for m in self.messages],
+        }
+
+
+class SessionStore:
+    """
+    In-memory sessions with idle eviction.
+
+    Sessions idle for longer than ``idle_timeout`` are dropped by a periodic
+    sweep, and the least recently used ones go first once ``max_sessions``
+    is reached, so memory stays bounded however many clients come and go.
+    """
+
+    def __init__(self, idle_timeout: float, max_sessions: int):
+        self.idle_timeout = idle_timeout
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self.evicted = 0
+
+    def create(
+        self,
+        model: str,
+        messages: List[Message],
+        context_tokens: Optional[int] = None
+    ) -> Session:
+        if context_tokens is None:
+            context_tokens = get_settings().SESSION_CONTEXT_TOKENS or None
+        session = Session(model, list(messages), context_tokens)
+        self._add(session)
+        return session
+
+    def restore(self, state: Dict[str, Any]) -> Session:
+        """
+        Replace this worker's copy of a session with ``state``.
+
+        ``state`` is what ``Session.to_dict`` returned in whichever worker
+        process last changed the session, plus its ``version``.
+        """
+        session = Session(
+            state["model"],
+            [Message(**m) for m in state["messages"]],
+            state["context_tokens"],
+            state["session_id"]
+        )
+        session.version = state["version"]
+        self._sessions.pop(session.id, None)
+        self._add(session)
+        return session
+
+    def _add(self, session: Session) -> None:
+        self._sessions[session.id] = session
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+            self.evicted += 1
+
+    def get(self, session_id: str) -> Optional[Session]:
+        session = self._sessions.get(session_id)
+        if session is None:
+            return None
+        if time.monotonic() - session.last_used > self.idle_timeout:
+            self.delete(session_id)
+            self.evicted += 1
+            return None
+        session.last_used = time.monotonic()
+        self._sessions.move_to_end(session_id)
+        return session
+
+    def delete(self, session_id: str) -> bool:
+        return self._sessions.pop(session_id, None) is not None
+
+    def evict_idle(self) -> int:
+        """Drop every idle session; returns how many were removed"""
+        cutoff = time.monotonic() - self.idle_timeout
+        # Sessions are kept in last-used order, so stop at the first fresh one
+        expired = []
+        for session_id, session in self._sessions.items():
+            if session.last_used > cutoff:
+                break
+            expired.append(session_id)
+        for session_id in expired:
+            del self._sessions[session_id]
+        self.evicted += len(expired)
+        return len(expired)
+
+    async def run_sweeper(self, interval: float) -> None:
+        """Evict idle sessions every ``interval`` seconds until cancelled"""
+        while True:
+            await asyncio.sleep(interval)
+            evicted = self.evict_idle()
+            if evicted:
+                logger.info(f"Evicted {evicted} idle chat sessions")
+
+    def stats(self) -> Dict[str, int]:
+        return {"sessions": len(self._sessions), "evicted": self.evicted}
+
+
+# Global session store instance
+session_store = SessionStore(
+    idle_timeout=get_settings().SESSION_IDLE_TIMEOUT,
+    max_sessions=get_settings().SESSION_MAX_SESSIONS,
+)
@@ -0,0 +1,117 @@
+import asyncio
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Tuple
+
+from loguru import logger
+
+from config import get_settings
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS shared_state (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    updated_at REAL NOT NULL,
+    expires_at REAL
+);
+"""
+
+
+class SharedState:
+    """
+    Small records shared by every worker process on this host.
+
+    Backed by a SQLite file in WAL mode, so one worker can publish what it
+    fetched (model catalogue, Ollama probe results) and the others reuse it
+    instead of asking Ollama again, and sessions can move between workers.
+    Errors are logged and reads then come back empty.
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self._conn: Optional[sqlite3.Connection] = None
+        # One statement at a time; to_thread may use any thread
+        self._lock = threading.Lock()
+
+    async def get(self, key: str) -> Optional[Tuple[bytes, float]]:
+        """The value stored under ``key`` and its age in seconds, if any"""
+        try:
+            return await asyncio.to_thread(self._get, key)
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to read shared state {key}: {e}")
+            return None
+
+    async def put(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        """Store ``value`` under ``key``, dropped after ``ttl`` seconds if given"""
+        try:
+            await asyncio.to_thread(self._put, key, value, ttl)
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to write shared state {key}: {e}")
+
+    async def delete(self, key: str) -> bool:
+        """Drop ``key``; whether a live value was stored under it"""
+        try:
+            return await asyncio.to_thread(self._delete, key)
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to delete shared state {key}: {e}")
+            return False
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # Wait on a writer in another process rather than failing at once
+            conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def _get(self, key: str) -> Optional[Tuple[bytes, float]]:
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT value, updated_at FROM shared_state"
+                " WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (key, time.time())
+            ).fetchone()
+        if row is None:
+            return None
+        value, updated_at = row
+        # Wall-clock time, since monotonic clocks are not comparable across processes
+        return value, max(time.time() - updated_at, 0.0)
+
+    def _put(self, key: str, value: bytes, ttl: Optional[float]) -> None:
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute(
+                    "INSERT INTO shared_state (key, value, updated_at, expires_at) VALUES (?, ?, ?, ?)"
+                    " ON CONFLICT (key) DO UPDATE SET value = excluded.value,"
+                    " updated_at = excluded.updated_at, expires_at = excluded.expires_at",
+                    (key, value, now, None if ttl is None else now + ttl)
+                )
+                if ttl is not None:
+                    conn.execute("DELETE FROM shared_state WHERE expires_at <= ?", (now,))
+
+    def _delete(self, key: str) -> bool:
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                cursor = conn.execute(
+                    "DELETE FROM shared_state WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+                    (key, time.time())
+                )
+        return cursor.rowcount > 0
+
+
+# Global shared state instance
+shared_state = SharedState(get_settings().SHARED_STATE_PATH)
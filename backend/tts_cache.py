@@ -0,0 +1,182 @@
+import asyncio
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional
+
+from loguru import logger
+
+from config import get_settings
+
+
+class TTSCache:
+    """
+    Content-addressed cache for synthesized audio.
+
+    A byte-bounded in-memory LRU sits in front of a size-capped directory of
+    MP3 files. Entries are keyed by a hash of everything that shapes the
+    audio, so the key doubles as a strong ETag.
+
+    The directory is shared by every worker process: files written by other
+    workers are picked up on a miss. Each worker enforces the size cap on
+    the files it knows about.
+    """
+
+    def __init__(self, memory_bytes: int, disk_dir: str, disk_bytes: int):
+        self.memory_limit = memory_bytes
+        self.disk_dir = Path(disk_dir)
+        self.disk_limit = disk_bytes
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._memory_size = 0
+        # Loaded from disk on first use so importing this module stays cheap
+        self._disk_index: Optional["OrderedDict[str, int]"] = None
+        self._disk_size = 0
+        self._disk_lock = asyncio.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(text: str, voice: str, rate: str, volume: str) -> str:
+        """Hash the synthesis inputs into a stable cache key"""
+        payload = json.dumps([text, voice, rate, volume], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path_for(self, key: str) -> Path:
+        return self.disk_dir / key[:2] / f"{key}.mp3"
+
+    async def get(self, key: str) -> Optional[bytes]:
+        """Return cached audio for ``key``, promoting disk hits into memory"""
+        data = self._memory.get(key)
+        if data is not None:
+            self._memory.move_to_end(key)
+            self.memory_hits += 1
+            return data
+
+        async with self._disk_lock:
+            index = await self._load_disk_index()
+            if key in index:
+                try:
+                    data = await asyncio.to_thread(self._read_file, self._path_for(key))
+                except OSError as e:
+                    logger.warning(f"Dropping unreadable TTS cache entry {key}: {e}")
+                    self._disk_size -= index.pop(key)
+                else:
+                    index.move_to_end(key)
+            else:
+                # Possibly written by another worker since the index was built
+                try:
+                    data = await asyncio.to_thread(self._read_file, self._path_for(key))
+                except OSError:
+                    pass
+                else:
+                    index[key] = len(data)
+                    self._disk_size += len(data)
+
+        if data is None:
+            self.misses += 1
+            return None
+
+        self.disk_hits += 1
+        self._remember(key, data)
+        return data
+
+    async def put(self, key: str, data: bytes) -> None:
+        """Store audio in both tiers, evicting the least recently used entries"""
+        self._remember(key, data)
+
+        if len(data) > self.disk_limit:
+            return
+        async with self._disk_lock:
+            index = await self._load_disk_index()
+            if key in index:
+                index.move_to_end(key)
+                return
+            try:
+                await asyncio.to_thread(self._write_file, self._path_for(key), data)
+            except OSError as e:
+                logger.warning(f"Failed to write TTS cache entry {key}: {e}")
+                return
+            index[key] = len(data)
+            self._disk_size += len(data)
+
+            while self._disk_size > self.disk_limit and index:
+                old_key, size = index.popitem(last=False)
+                self._disk_size -= size
+                await asyncio.to_thread(self._remove_file, self._path_for(old_key))
+
+    def stats(self) -> Dict[str, int]:
+        """Hit/miss counters and current tier sizes"""
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "memory_entries": len(self._memory),
+            "memory_bytes": self._memory_size,
+            "disk_entries": len(self._disk_index or ()),
+            "disk_bytes": self._disk_size,
+        }
+
+    def _remember(self, key: str, data: bytes) -> None:
+        if len(data) > self.memory_limit:
+            return
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._memory_size -= len(previous)
+        self._memory[key] = data
+        self._memory_size += len(data)
+        while self._memory_size > self.memory_limit:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_size -= len(evicted)
+
+    async def _load_disk_index(self) -> "OrderedDict[str, int]":
+        if self._disk_index is None:
+            entries = await asyncio.to_thread(self._scan_disk)
+            self._disk_index = OrderedDict(entries)
+            self._disk_size = sum(size for _, size in entries)
+        return self._disk_index
+
+    def _scan_disk(self):
+        """List existing entries oldest-access first so eviction order survives restarts"""
+        if not self.disk_dir.exists():
+            return []
+        entries = []
+        for path in self.disk_dir.glob("*/*.mp3"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, path.stem, stat.st_size))
+        entries.sort()
+        return [(key, size) for _, key, size in entries]
+
+    @staticmethod
+    def _read_file(path: Path) -> bytes:
+        data = path.read_bytes()
+        # Touch the file so the access order is kept across restarts
+        os.utime(path)
+        return data
+
+    @staticmethod
+    def _write_file(path: Path, data: bytes) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _remove_file(path: Path) -> None:
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+# Global TTS cache instance
+tts_cache = TTSCache(
+    memory_bytes=get_settings().TTS_CACHE_MEMORY_BYTES,
+    disk_dir=get_settings().TTS_CACHE_DIR,
+    disk_bytes=get_settings().TTS_CACHE_DISK_BYTES,
+)
@@ -0,0 +1,110 @@
+import asyncio
+from typing import AsyncGenerator, Dict, List, Optional
+
+from loguru import logger
+
+from tts_service import cached_speech
+from voice_pipeline import SentenceSplitter
+
+
+def split_segments(text: str, max_chars: int) -> List[str]:
+    """
+    Cut ``text`` into sentences to synthesize separately.
+
+    Line breaks always end a segment; a sentence longer than ``max_chars``
+    is cut at the last space that fits (or hard at ``max_chars``).
+    """
+    segments = []
+    # Split per line, so short lines (headings, list items) are not merged into the next
+    for line in text.splitlines():
+        splitter = SentenceSplitter()
+        for sentence in splitter.feed(line) + splitter.flush():
+            while len(sentence) > max_chars:
+                cut = sentence.rfind(" ", 0, max_chars + 1)
+                if cut <= 0:
+                    cut = max_chars
+                segments.append(sentence[:cut].strip())
+                sentence = sentence[cut:].strip()
+            if sentence:
+                segments.append(sentence)
+    return segments
+
+
+class _Clip:
+    """One segment's audio as it is synthesized, replayable by every position that repeats it"""
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.done = False
+        self.error: Optional[Exception] = None
+        self._changed = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+    async def synthesize(self, text: str, voice: str, rate: str, volume: str) -> None:
+        try:
+            async for chunk in cached_speech(text, voice, rate, volume):
+                self.chunks.append(chunk)
+                self._changed.set()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done = True
+            self._changed.set()
+
+    async def replay(self) -> AsyncGenerator[bytes, None]:
+        sent = 0
+        while True:
+            while sent < len(self.chunks):
+                yield self.chunks[sent]
+                sent += 1
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            self._changed.clear()
+            await self._changed.wait()
+
+
+async def stream_segments(
+    segments: List[str],
+    voice: str,
+    rate: str,
+    volume: str,
+    max_parallel: int
+) -> AsyncGenerator[bytes, None]:
+    """
+    Yield the audio of ``segments`` in order.
+
+    Up to ``max_parallel`` segments from the current one onwards are
+    synthesized at once, so the leading segment streams while the next ones
+    are prepared and at most that many finished clips wait in memory.
+    Repeated segments are synthesized once and replayed. A segment that
+    fails is logged and skipped, since the response has already started.
+    """
+    clips: Dict[str, _Clip] = {}
+    last_use = {text: index for index, text in enumerate(segments)}
+    started = 0
+    try:
+        for index, text in enumerate(segments):
+            while started < min(index + max_parallel, len(segments)):
+                upcoming = segments[started]
+                if upcoming not in clips:
+                    clip = clips[upcoming] = _Clip()
+                    clip.task = asyncio.create_task(clip.synthesize(upcoming, voice, rate, volume))
+                started += 1
+            clip = clips[text]
+            try:
+                async for chunk in clip.replay():
+                    yield chunk
+            except Exception as e:
+                if index == 0:
+                    raise
+                logger.error(f"TTS error in segment {index}, skipped: {str(e)}")
+            if last_use[text] == index:
+                # Not needed again; free its audio
+                del clips[text]
+    finally:
+        pending = [clip.task for clip in clips.values() if clip.task is not None and not clip.task.done()]
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
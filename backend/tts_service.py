@@ -1,10 +1,9 @@
-import os
-import tempfile
-import asyncio
+import time
 from typing import AsyncGenerator, Optional
 from dataclasses import dataclass
-import edge_tts
 from loguru import logger
+from metrics import tts_audio_bytes, tts_synthesis_duration
+from tts_cache import tts_cache
 
 @dataclass
 class TTSConfig:
@@ -12,6 +11,44 @@ class TTSConfig:
     rate: str = "+0%"  # Speaking rate adjustment
     volume: str = "+0%"  # Volume adjustment
 
+async def stream_speech(text: str, voice: str, rate: str, volume: str) -> AsyncGenerator[bytes, None]:
+    """
+    Yield MP3 chunks as edge-tts produces them.
+
+    Nothing touches the disk on the way out; the chunks are joined once into
+    the cache only after the clip has been synthesized completely.
+    """
+    # Imported on first use: edge-tts pulls in aiohttp, which slows startup
+    import edge_tts
+    
+    communicate = edge_tts.Communicate(
+        text=text,
+        voice=voice,
+        rate=rate,
+        volume=volume
+    )
+    chunks = []
+    start_time = time.perf_counter()
+    async for message in communicate.stream():
+        if message["type"] == "audio":
+            chunks.append(message["data"])
+            yield message["data"]
+    audio = b"".join(chunks)
+    tts_synthesis_duration.observe(time.perf_counter() - start_time)
+    tts_audio_bytes.observe(len(audio))
+    await tts_cache.put(tts_cache.make_key(text, voice, rate, volume), audio)
+
+async def cached_speech(text: str, voice: str, rate: str, volume: str, chunk_size: int = 4096) -> AsyncGenerator[bytes, None]:
+    """Yield audio for ``text`` from the TTS cache, synthesizing it on a miss"""
+    cached = await tts_cache.get(tts_cache.make_key(text, voice, rate, volume))
+    if cached is not None:
+        for offset in range(0, len(cached), chunk_size):
+            yield cached[offset:offset + chunk_size]
+        return
+    
+    async for chunk in stream_speech(text, voice, rate, volume):
+        yield chunk
+
 class TTSService:
     def __init__(self, config: Optional[TTSConfig] = None):
         self.config = config or TTSConfig()
@@ -19,42 +56,18 @@ class TTSService:
     async def text_to_speech(self, text: str) -> AsyncGenerator[bytes, None]:
         """Convert text to speech and yield audio chunks"""
         try:
-            # Create a temporary file to store the audio
-            with tempfile.NamedTemporaryFile(suffix='.mp3', delete=False) as temp_file:
-                temp_path = temp_file.name
-            
-            # Generate speech and save to temp file
-            communicate = edge_tts.Communicate(
-                text=text,
-                voice=self.config.voice,
-                rate=self.config.rate,
-                volume=self.config.volume
-            )
-            
-            # Save to the temp file
-            await communicate.save(temp_path)
-            
-            # Read the file in chunks and yield
-            chunk_size = 4096
-            with open(temp_path, 'rb') as audio_file:
-                while True:
-                    chunk = audio_file.read(chunk_size)
-                    if not chunk:
-                        break
-                    yield chunk
-            
-            # Clean up
-            try:
-                os.unlink(temp_path)
-            except Exception as e:
-                logger.warning(f"Failed to delete temp file {temp_path}: {e}")
-                
+            async for chunk in cached_speech(text, self.config.voice, self.config.rate, self.config.volume):
+                yield chunk
         except Exception as e:
             logger.error(f"Error in text_to_speech: {str(e)}")
             raise
     
     async def play_audio(self, audio_data: bytes, sample_rate: int = 22050):
-        """Play audio data using sounddevice"""
+        """Play audio data using sounddevice and numpy (optional, neither is in requirements.txt)"""
+        # Only needed for local playback, so not loaded with the server
+        import numpy as np
+        import sounddevice as sd
+        
         try:
             # Convert bytes back to numpy array
             audio_array = np.frombuffer(audio_data, dtype=np.int16)
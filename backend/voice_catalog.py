@@ -0,0 +1,174 @@
+import asyncio
+import json
+import re
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
+
+from config import get_settings
+
+# Shipped with the app so voices can be listed offline and before the first fetch;
+# regenerate it with ``python -m voice_catalog``
+SNAPSHOT_PATH = Path(__file__).with_name("voices_snapshot.json")
+
+# Shape of an edge-tts short name, e.g. en-US-AriaNeural or zh-CN-liaoning-XiaobeiNeural
+VOICE_NAME = re.compile(r"^[a-z]{2,3}-[A-Z]{2}(-[A-Za-z]+)?-[A-Za-z]+Neural$")
+
+# Seconds to wait before fetching again after a failed fetch
+RETRY_INTERVAL = 300.0
+
+Voice = Dict[str, Any]
+
+
+class VoiceCatalog:
+    """
+    The edge-tts voice list, fetched once and indexed.
+
+    Starts from the bundled snapshot, then replaces it with the live list
+    from edge-tts in the background, at most once per ``ttl``. Voices are
+    indexed by short name, locale, language and gender, so lookups never
+    scan the full list.
+
+    Voice names are checked against the live list once it has been fetched.
+    The bundled snapshot only covers common voices, so until then any name
+    shaped like an edge-tts voice is accepted.
+    """
+
+    def __init__(self, ttl: float, snapshot_path: Path = SNAPSHOT_PATH):
+        self.ttl = ttl
+        self.snapshot_path = snapshot_path
+        self.voices: List[Voice] = []
+        self.source: Optional[str] = None  # "snapshot" or "live"
+        self.fetched_at = 0.0
+        self._failed_at: Optional[float] = None
+        self._by_name: Dict[str, Voice] = {}
+        self._by_locale: Dict[str, List[Voice]] = {}
+        self._by_language: Dict[str, List[Voice]] = {}
+        self._by_gender: Dict[str, List[Voice]] = {}
+        self._refresh: Optional[asyncio.Task] = None
+
+    def _ensure_loaded(self) -> None:
+        # Read on first use so importing this module stays cheap
+        if self.source is None:
+            try:
+                voices = json.loads(self.snapshot_path.read_text(encoding="utf-8"))
+            except (OSError, ValueError) as e:
+                logger.warning(f"Failed to read voice snapshot {self.snapshot_path}: {str(e)}")
+                voices = []
+            self._index(voices, "snapshot")
+
+    def _index(self, voices: List[Voice], source: str) -> None:
+        by_name: Dict[str, Voice] = {}
+        by_locale: Dict[str, List[Voice]] = {}
+        by_language: Dict[str, List[Voice]] = {}
+        by_gender: Dict[str, List[Voice]] = {}
+        for voice in voices:
+            locale = voice.get("Locale", "").lower()
+            by_name[voice["ShortName"]] = voice
+            by_locale.setdefault(locale, []).append(voice)
+            by_language.setdefault(locale.split("-", 1)[0], []).append(voice)
+            by_gender.setdefault(voice.get("Gender", "").lower(), []).append(voice)
+        # Swapped in together so readers never see a half-built index
+        self.voices = voices
+        self._by_name, self._by_locale = by_name, by_locale
+        self._by_language, self._by_gender = by_language, by_gender
+        self.source = source
+        self.fetched_at = time.monotonic()
+        self._failed_at = None
+
+    def refresh(self) -> asyncio.Task:
+        """Fetch the live list in the background; concurrent calls share one fetch"""
+        if self._refresh is None:
+            self._refresh = asyncio.create_task(self._fetch())
+            self._refresh.add_done_callback(self._refresh_done)
+        return self._refresh
+
+    async def _fetch(self) -> None:
+        # Imported here so listing voices from the snapshot never loads edge-tts
+        import edge_tts
+        voices = await edge_tts.list_voices()
+        self._index(voices, "live")
+        logger.info(f"Loaded {len(voices)} edge-tts voices")
+
+    def _refresh_done(self, task: asyncio.Task) -> None:
+        self._refresh = None
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"Failed to refresh voice list: {str(task.exception())}")
+            self._failed_at = time.monotonic()
+
+    def _revalidate(self) -> None:
+        self._ensure_loaded()
+        now = time.monotonic()
+        if self._refresh is not None:
+            return
+        if self._failed_at is not None and now - self._failed_at < RETRY_INTERVAL:
+            return
+        if self.source != "live" or now - self.fetched_at >= self.ttl:
+            try:
+                self.refresh()
+            except RuntimeError:
+                # No running event loop; keep serving what is loaded
+                pass
+
+    def find(
+        self,
+        locale: Optional[str] = None,
+        language: Optional[str] = None,
+        gender: Optional[str] = None
+    ) -> List[Voice]:
+        """Voices matching every given filter (case-insensitive)"""
+        self._revalidate()
+        filters = [
+            (self._by_locale, locale),
+            (self._by_language, language),
+            (self._by_gender, gender),
+        ]
+        matches = [index.get(value.lower(), []) for index, value in filters if value]
+        if not matches:
+            return self.voices
+        # Start from the smallest bucket and keep what the others also hold
+        matches.sort(key=len)
+        result = matches[0]
+        for other in matches[1:]:
+            names = {voice["ShortName"] for voice in other}
+            result = [voice for voice in result if voice["ShortName"] in names]
+        return result
+
+    def get(self, name: str) -> Optional[Voice]:
+        self._revalidate()
+        return self._by_name.get(name)
+
+    def is_valid(self, name: str) -> bool:
+        """Whether edge-tts can be expected to know the voice ``name``"""
+        if self.get(name) is not None:
+            return True
+        return self.source != "live" and VOICE_NAME.match(name) is not None
+
+    def stats(self) -> Dict[str, Any]:
+        self._ensure_loaded()
+        return {
+            "voices": len(self.voices),
+            "locales": len(self._by_locale),
+            "source": self.source,
+            "age": round(time.monotonic() - self.fetched_at, 1),
+        }
+
+
+# Global voice catalogue instance
+voice_catalog = VoiceCatalog(ttl=get_settings().TTS_VOICES_TTL)
+
+
+async def write_snapshot(path: Path = SNAPSHOT_PATH) -> int:
+    """Replace the bundled snapshot with the current live list"""
+    import edge_tts
+    voices = await edge_tts.list_voices()
+    voices.sort(key=lambda voice: voice["ShortName"])
+    path.write_text(json.dumps(voices, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+    return len(voices)
+
+
+if __name__ == "__main__":
+    count = asyncio.run(write_snapshot())
+    print(f"Wrote {count} voices to {SNAPSHOT_PATH}")
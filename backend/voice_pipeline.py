@@ -0,0 +1,170 @@
+import asyncio
+import json
+import re
+from typing import Any, AsyncGenerator, Awaitable, Callable, Dict, List
+
+import anyio
+import httpx
+from loguru import logger
+
+from config import get_settings
+from ollama_client import iter_lines, open_stream
+from tts_service import cached_speech
+
+# A sentence ends at terminal punctuation (plus closing quotes/brackets)
+# followed by whitespace, or at a line break. Requiring the whitespace keeps
+# "3.14" or a trailing "." that may still be followed by "5" in one piece.
+SENTENCE_BOUNDARY = re.compile(r"[.!?;:。！？][\"')\]”’]*\s+|\n+")
+
+
+class SentenceSplitter:
+    """Incrementally cut a stream of LLM tokens into speakable sentences"""
+
+    def __init__(self, min_chars: int = 20):
+        # Fragments shorter than this ("Hi.", "e.g.") are merged with the next
+        # sentence so each TTS call carries enough text to sound natural
+        self.min_chars = min_chars
+        self._buffer = ""
+
+    def feed(self, text: str) -> List[str]:
+        """Add tokens and return every sentence completed by them"""
+        self._buffer += text
+        sentences = []
+        start = 0
+        for match in SENTENCE_BOUNDARY.finditer(self._buffer):
+            sentence = self._buffer[start:match.end()].strip()
+            if len(sentence) < self.min_chars:
+                continue
+            sentences.append(sentence)
+            start = match.end()
+        self._buffer = self._buffer[start:]
+        return sentences
+
+    def flush(self) -> List[str]:
+        """Return whatever is left once the token stream has ended"""
+        sentence = self._buffer.strip()
+        self._buffer = ""
+        return [sentence] if sentence else []
+
+
+async def stream_chat_tokens(
+    client: httpx.AsyncClient,
+    payload: Dict[str, Any]
+) -> AsyncGenerator[str, None]:
+    """Yield the content deltas of a streaming Ollama chat"""
+    response = await open_stream(client, "/api/chat", {**payload, "stream": True})
+    try:
+        async for line in iter_lines(response, get_settings().OLLAMA_INTER_TOKEN_TIMEOUT):
+            data = json.loads(line)
+            if "error" in data:
+                raise RuntimeError(data["error"])
+            content = data.get("message", {}).get("content", "")
+            if content:
+                yield content
+            if data.get("done"):
+                return
+    finally:
+        with anyio.CancelScope(shield=True):
+            await response.aclose()
+
+
+class VoicePipeline:
+    """
+    Speak an LLM reply sentence by sentence while it is still being generated.
+
+    A producer streams the Ollama chat, splits it into sentences and starts
+    TTS for each one as soon as it is complete, up to ``max_parallel_tts``
+    syntheses at a time. A consumer sends the audio strictly in sentence
+    order, forwarding the leading sentence's chunks as they are synthesized
+    while later sentences buffer behind it.
+    """
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        payload: Dict[str, Any],
+        send_json: Callable[[Dict[str, Any]], Awaitable[None]],
+        send_bytes: Callable[[bytes], Awaitable[None]],
+        voice: str,
+        rate: str,
+        volume: str,
+        max_parallel_tts: int,
+        min_sentence_chars: int
+    ):
+        self.client = client
+        self.payload = payload
+        self.send_json = send_json
+        self.send_bytes = send_bytes
+        self.voice = voice
+        self.rate = rate
+        self.volume = volume
+        self.splitter = SentenceSplitter(min_sentence_chars)
+        self._tts_slots = asyncio.Semaphore(max_parallel_tts)
+        self._tts_tasks: List[asyncio.Task] = []
+
+    async def run(self) -> None:
+        # Each entry is (index, sentence, chunk queue); None marks the end
+        segments: asyncio.Queue = asyncio.Queue()
+        producer = asyncio.create_task(self._produce(segments))
+        try:
+            await self._consume(segments)
+            await producer
+            await self.send_json({"type": "done"})
+        finally:
+            for task in [producer, *self._tts_tasks]:
+                if not task.done():
+                    task.cancel()
+            await asyncio.gather(producer, *self._tts_tasks, return_exceptions=True)
+
+    async def _produce(self, segments: asyncio.Queue) -> None:
+        index = 0
+        reply = []
+        try:
+            async for token in stream_chat_tokens(self.client, self.payload):
+                reply.append(token)
+                await self.send_json({"type": "token", "content": token})
+                for sentence in self.splitter.feed(token):
+                    self._start_sentence(segments, index, sentence)
+                    index += 1
+            for sentence in self.splitter.flush():
+                self._start_sentence(segments, index, sentence)
+                index += 1
+            await self.send_json({"type": "reply", "content": "".join(reply)})
+        finally:
+            segments.put_nowait(None)
+
+    def _start_sentence(self, segments: asyncio.Queue, index: int, sentence: str) -> None:
+        chunks: asyncio.Queue = asyncio.Queue()
+        self._tts_tasks.append(asyncio.create_task(self._synthesize(sentence, chunks)))
+        segments.put_nowait((index, sentence, chunks))
+
+    async def _synthesize(self, sentence: str, chunks: asyncio.Queue) -> None:
+        try:
+            async with self._tts_slots:
+                async for chunk in cached_speech(sentence, self.voice, self.rate, self.volume):
+                    chunks.put_nowait(chunk)
+        except Exception as e:
+            logger.error(f"Voice pipeline TTS error: {str(e)}")
+            chunks.put_nowait(e)
+        finally:
+            chunks.put_nowait(None)
+
+    async def _consume(self, segments: asyncio.Queue) -> None:
+        while True:
+            segment = await segments.get()
+            if segment is None:
+                break
+            index, sentence, chunks = segment
+            await self.send_json({"type": "sentence", "index": index, "text": sentence})
+            while True:
+                chunk = await chunks.get()
+                if chunk is None:
+                    break
+                if isinstance(chunk, Exception):
+                    await self.send_json({
+                        "type": "error",
+                        "message": f"TTS Error: {str(chunk)}"
+                    })
+                    continue
+                await self.send_bytes(chunk)
+            await self.send_json({"type": "sentence_end", "index": index})
@@ -0,0 +1,160 @@
+"""
+Framed binary protocol for the voice WebSocket.
+
+Clients opt in by sending ``{"type": "hello", "protocol": "framed",
+"version": 1}`` as a text message; everything the server sends afterwards is
+a binary frame. Clients that never say hello keep the plain JSON/raw-bytes
+protocol.
+
+Every frame starts with a 12-byte big-endian header::
+
+    version (u8) | flags (u8) | codec (u8) | reserved (u8) | stream id (u32) | seq (u32)
+
+followed by the payload. Each utterance (a TTS or chat request) is one
+stream, numbered by the server; stream 0 carries connection-level messages.
+Sequence numbers count frames per stream starting at 0. The last frame of a
+stream has ``FLAG_END`` set and, if the stream was cancelled, ``FLAG_CANCEL``.
+
+Clients may send header-only frames back: ``FLAG_ACK`` acknowledges every
+frame of the stream up to and including ``seq``, ``FLAG_CANCEL`` stops the
+stream. When the hello asks for a ``window``, the server keeps at most that
+many unacknowledged frames in flight per stream.
+"""
+import asyncio
+import json
+import struct
+from typing import Any, Dict, NamedTuple, Optional, Union
+
+PROTOCOL_NAME = "framed"
+PROTOCOL_VERSION = 1
+
+HEADER = struct.Struct("!BBBBII")
+
+# Flags
+FLAG_END = 0x01
+FLAG_CANCEL = 0x02
+FLAG_ACK = 0x04
+
+# Codec tags
+CODEC_NONE = 0
+CODEC_JSON = 1
+CODEC_MP3 = 2
+
+CONTROL_STREAM = 0
+
+
+class FrameError(ValueError):
+    """Raised for frames that cannot be decoded"""
+
+
+class Frame(NamedTuple):
+    version: int
+    flags: int
+    codec: int
+    stream_id: int
+    seq: int
+    payload: bytes
+
+
+def encode_frame(stream_id: int, seq: int, flags: int, codec: int, payload: bytes = b"") -> bytes:
+    return HEADER.pack(PROTOCOL_VERSION, flags, codec, 0, stream_id, seq) + payload
+
+
+def decode_frame(data: bytes) -> Frame:
+    if len(data) < HEADER.size:
+        raise FrameError(f"Frame shorter than the {HEADER.size}-byte header")
+    version, flags, codec, _, stream_id, seq = HEADER.unpack_from(data)
+    if version != PROTOCOL_VERSION:
+        raise FrameError(f"Unsupported frame version {version}")
+    return Frame(version, flags, codec, stream_id, seq, data[HEADER.size:])
+
+
+class _StreamState:
+    __slots__ = ("next_seq", "acked", "credit")
+
+    def __init__(self):
+        self.next_seq = 0
+        self.acked = -1
+        self.credit = asyncio.Event()
+
+
+class FramedSession:
+    """Per-connection framing state: sequence numbers and ack-based flow control"""
+
+    def __init__(self, window: int = 0):
+        # 0 disables flow control for clients that never ack
+        self.window = window
+        self._streams: Dict[int, _StreamState] = {}
+
+    async def frame(
+        self,
+        stream_id: int,
+        payload: Union[bytes, Dict[str, Any], None],
+        flags: int = 0
+    ) -> bytes:
+        """
+        Encode ``payload`` as the next frame of ``stream_id``.
+
+        Waits while the stream's window is exhausted. The control stream and
+        end-of-stream frames are never held back.
+        """
+        state = self._streams.setdefault(stream_id, _StreamState())
+        while (
+            self.window
+            and stream_id != CONTROL_STREAM
+            and not flags & FLAG_END
+            and state.next_seq - state.acked > self.window
+        ):
+            state.credit.clear()
+            await state.credit.wait()
+        return self.encode(stream_id, payload, flags)
+
+    def encode(
+        self,
+        stream_id: int,
+        payload: Union[bytes, Dict[str, Any], None],
+        flags: int = 0
+    ) -> bytes:
+        """
+        Encode ``payload`` as the next frame of ``stream_id`` without waiting.
+
+        Bytes are tagged as MP3 audio, dicts as JSON and ``None`` produces a
+        header-only frame.
+        """
+        state = self._streams.setdefault(stream_id, _StreamState())
+        if payload is None:
+            codec, body = CODEC_NONE, b""
+        elif isinstance(payload, bytes):
+            codec, body = CODEC_MP3, payload
+        else:
+            codec, body = CODEC_JSON, json.dumps(payload).encode("utf-8")
+
+        seq = state.next_seq
+        state.next_seq += 1
+        if flags & FLAG_END:
+            self._streams.pop(stream_id, None)
+            state.credit.set()
+        return encode_frame(stream_id, seq, flags, codec, body)
+
+    def ack(self, stream_id: int, seq: int) -> None:
+        state = self._streams.get(stream_id)
+        if state is not None and seq > state.acked:
+            state.acked = seq
+            state.credit.set()
+
+    def close(self) -> None:
+        """Release every producer waiting for credit"""
+        self.window = 0
+        for state in self._streams.values():
+            state.credit.set()
+        self._streams.clear()
+
+
+def parse_hello(message: Dict[str, Any]) -> Optional[FramedSession]:
+    """Return a session for a valid framed-protocol hello, else None"""
+    if message.get("protocol") != PROTOCOL_NAME or message.get("version") != PROTOCOL_VERSION:
+        return None
+    window = message.get("window", 0)
+    if not isinstance(window, int) or window < 0:
+        return None
+    return FramedSession(window)
@@ -1,58 +1,349 @@
 import asyncio
+import itertools
+import time
+from functools import partial
 import json
-import base64
-from typing import Dict, Any, Optional
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Union
 from fastapi import WebSocket, WebSocketDisconnect
 from loguru import logger
+from pydantic import ValidationError
+from config import get_settings
+from metrics import register_gauge, ws_send_duration
+from models import ChatRequest
+from ollama_pool import OllamaUnavailable, keep_alive_for
+from scheduler import SchedulerFull, get_client_key, scheduler
 from tts_service import tts_service
+from voice_catalog import voice_catalog
+from voice_pipeline import VoicePipeline
+from voice_protocol import (
+    CONTROL_STREAM,
+    FLAG_ACK,
+    FLAG_CANCEL,
+    FLAG_END,
+    PROTOCOL_NAME,
+    PROTOCOL_VERSION,
+    FrameError,
+    FramedSession,
+    decode_frame,
+    parse_hello,
+)
 
 class ConnectionManager:
+    """
+    Tracks voice connections and everything they own.
+
+    Each client gets a bounded outbound queue drained by a single writer task,
+    so producers block (backpressure) instead of buffering without limit when
+    the browser reads slowly. TTS and chat work runs as "utterances": tasks
+    capped per client that a new request or an explicit cancel interrupts.
+    Clients that negotiate the framed protocol (see ``voice_protocol``) get
+    every message as a binary frame tagged with its utterance's stream id.
+    """
+
     def __init__(self):
         self.active_connections: Dict[str, WebSocket] = {}
-        self.audio_queues: Dict[str, asyncio.Queue] = {}
+        self.send_queues: Dict[str, asyncio.Queue] = {}
+        self.writer_tasks: Dict[str, asyncio.Task] = {}
+        self.utterances: Dict[str, Dict[int, asyncio.Task]] = {}
+        # Utterances cancelled while some of their output was still queued
+        self.cancelled_utterances: Dict[str, Set[int]] = {}
+        self.framing: Dict[str, FramedSession] = {}
+        self._utterance_ids = itertools.count(1)
 
     async def connect(self, websocket: WebSocket, client_id: str):
         await websocket.accept()
+        previous = self.active_connections.get(client_id)
+        if previous is not None:
+            # A reconnect replaces the old socket, which must not keep sending
+            self.disconnect(client_id)
+            try:
+                await previous.close()
+            except Exception as e:
+                logger.debug("Closing replaced socket of {}: {}", client_id, e)
+        queue = asyncio.Queue(maxsize=get_settings().WS_SEND_QUEUE_SIZE)
         self.active_connections[client_id] = websocket
-        self.audio_queues[client_id] = asyncio.Queue()
+        self.send_queues[client_id] = queue
+        self.utterances[client_id] = {}
+        self.cancelled_utterances[client_id] = set()
+        self.writer_tasks[client_id] = asyncio.create_task(
+            self._writer(client_id, websocket, queue)
+        )
         logger.info(f"Client {client_id} connected")
 
-    def disconnect(self, client_id: str):
-        self.active_connections.pop(client_id, None)
-        self.audio_queues.pop(client_id, None)
+    def disconnect(self, client_id: str, websocket: Optional[WebSocket] = None):
+        """
+        Tear down ``client_id``'s connection.
+
+        With ``websocket``, only if that socket is still the client's current
+        one, so a socket that was replaced by a reconnect cannot end the new one.
+        """
+        if websocket is not None and self.active_connections.get(client_id) is not websocket:
+            return
+        if self.active_connections.pop(client_id, None) is None:
+            return
+        self.send_queues.pop(client_id, None)
+        self.cancelled_utterances.pop(client_id, None)
+        framing = self.framing.pop(client_id, None)
+        if framing is not None:
+            framing.close()
+        for task in self.utterances.pop(client_id, {}).values():
+            task.cancel()
+        writer = self.writer_tasks.pop(client_id, None)
+        if writer is not None:
+            writer.cancel()
         logger.info(f"Client {client_id} disconnected")
 
-    async def send_audio_chunk(self, client_id: str, audio_chunk: bytes):
-        if client_id in self.active_connections:
+    async def _writer(self, client_id: str, websocket: WebSocket, queue: asyncio.Queue):
+        """Sole sender on the socket, so frames from different tasks never interleave mid-message"""
+        try:
+            while True:
+                utterance_id, payload = await queue.get()
+                cancelled = self.cancelled_utterances.get(client_id, set())
+                skip = utterance_id in cancelled
+                if queue.empty():
+                    # Nothing from a cancelled utterance can still be queued
+                    cancelled.clear()
+                if skip:
+                    continue
+                start_time = time.perf_counter()
+                if isinstance(payload, bytes):
+                    await websocket.send_bytes(payload)
+                else:
+                    await websocket.send_json(payload)
+                ws_send_duration.observe(time.perf_counter() - start_time)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error sending to {client_id}: {str(e)}")
+            self.disconnect(client_id, websocket)
+
+    async def _enqueue(
+        self,
+        client_id: str,
+        payload: Union[bytes, Dict[str, Any], None],
+        utterance_id: Optional[int] = None,
+        flags: int = 0
+    ):
+        queue = self.send_queues.get(client_id)
+        if queue is None:
+            return
+        framing = self.framing.get(client_id)
+        if framing is not None:
+            payload = await framing.frame(utterance_id or CONTROL_STREAM, payload, flags)
+        elif payload is None:
+            # Header-only frames have no JSON-protocol equivalent
+            return
+        # Blocks while the queue is full, throttling the producer
+        await queue.put((utterance_id, payload))
+
+    async def send_audio_chunk(self, client_id: str, audio_chunk: bytes, utterance_id: Optional[int] = None):
+        await self._enqueue(client_id, audio_chunk, utterance_id)
+
+    async def send_json(self, client_id: str, data: Dict[str, Any], utterance_id: Optional[int] = None):
+        await self._enqueue(client_id, data, utterance_id)
+
+    def _send_nowait(
+        self,
+        client_id: str,
+        payload: Optional[Dict[str, Any]],
+        stream_id: int = CONTROL_STREAM,
+        flags: int = 0
+    ):
+        """
+        Queue a control message without waiting for room or credit.
+
+        Used from the receive loop, which must never block on a stalled
+        client. The message is tagged with no utterance so the writer never
+        drops it as cancelled output.
+        """
+        queue = self.send_queues.get(client_id)
+        if queue is None:
+            return
+        framing = self.framing.get(client_id)
+        if framing is not None:
+            payload = framing.encode(stream_id, payload, flags)
+        elif payload is None:
+            return
+        try:
+            queue.put_nowait((None, payload))
+        except asyncio.QueueFull:
+            logger.warning(f"Dropping message for {client_id}, send queue is full")
+
+    async def send_error(self, client_id: str, message: str, utterance_id: Optional[int] = None):
+        """
+        Report an error to ``client_id``.
+
+        An utterance's error goes out on its own stream, after the output it
+        already produced; anything else is sent on the control stream at once.
+        """
+        error = {"type": "error", "message": message}
+        if utterance_id is None:
+            self._send_nowait(client_id, error)
+        else:
+            await self._enqueue(client_id, error, utterance_id)
+
+    def enable_framing(self, client_id: str, message: Dict[str, Any]) -> bool:
+        """Switch a client to the framed protocol if its hello is acceptable"""
+        session = parse_hello(message)
+        if session is None or client_id not in self.active_connections:
+            return False
+        # Confirmed in plain JSON; every later message is framed
+        self._send_nowait(client_id, {
+            "type": "hello",
+            "protocol": PROTOCOL_NAME,
+            "version": PROTOCOL_VERSION,
+            "window": session.window
+        })
+        self.framing[client_id] = session
+        return True
+
+    async def handle_frame(self, client_id: str, data: bytes):
+        """Apply an ack or cancel frame sent by a framed-protocol client"""
+        framing = self.framing.get(client_id)
+        if framing is None:
+            await self.send_error(client_id, "Binary frames require the framed protocol")
+            return
+        try:
+            frame = decode_frame(data)
+        except FrameError as e:
+            await self.send_error(client_id, f"Invalid frame: {str(e)}")
+            return
+        if frame.flags & FLAG_ACK:
+            framing.ack(frame.stream_id, frame.seq)
+        if frame.flags & FLAG_CANCEL:
+            await self.cancel_utterances(client_id, [frame.stream_id])
+
+    async def start_utterance(
+        self,
+        client_id: str,
+        work: Callable[[int], Awaitable[None]],
+        interrupt: bool = True,
+        request_id: Any = None
+    ) -> Optional[int]:
+        """
+        Run ``work(utterance_id)`` as a cancellable utterance for ``client_id``.
+
+        With ``interrupt`` (barge-in) every utterance in progress is cancelled
+        first; otherwise the new one is refused once the per-client cap is hit.
+        Framed clients see the utterance as a stream that opens with a
+        ``start`` event echoing ``request_id`` and closes with an end frame.
+        """
+        if client_id not in self.active_connections:
+            return None
+        if interrupt:
+            await self.cancel_utterances(client_id)
+        active = self.utterances[client_id]
+        if len(active) >= get_settings().WS_MAX_UTTERANCES_PER_CLIENT:
+            await self.send_error(client_id, "Too many utterances in progress")
+            return None
+        
+        utterance_id = next(self._utterance_ids)
+        
+        async def run():
+            if client_id in self.framing:
+                await self._enqueue(client_id, {"type": "start", "request_id": request_id}, utterance_id)
             try:
-                await self.active_connections[client_id].send_bytes(audio_chunk)
+                await work(utterance_id)
             except Exception as e:
-                logger.error(f"Error sending audio to {client_id}: {str(e)}")
-                self.disconnect(client_id)
+                logger.error(f"Error in utterance {utterance_id} for {client_id}: {str(e)}")
+                await self.send_error(client_id, f"Server error: {str(e)}", utterance_id)
+            if client_id in self.framing:
+                await self._enqueue(client_id, None, utterance_id, FLAG_END)
+        
+        task = asyncio.create_task(run())
+        active[utterance_id] = task
+        task.add_done_callback(lambda _: active.pop(utterance_id, None))
+        return utterance_id
 
-    async def process_text_to_speech(self, client_id: str, text: str):
+    async def cancel_utterances(self, client_id: str, utterance_ids: Optional[List[int]] = None):
+        """Stop the given (default: every) utterance of ``client_id`` and drop its queued output"""
+        active = self.utterances.get(client_id)
+        if not active:
+            return
+        tasks = [
+            (utterance_id, task) for utterance_id, task in active.items()
+            if utterance_ids is None or utterance_id in utterance_ids
+        ]
+        if not tasks:
+            return
+        cancelled = self.cancelled_utterances[client_id]
+        for utterance_id, task in tasks:
+            cancelled.add(utterance_id)
+            task.cancel()
+        await asyncio.gather(*(task for _, task in tasks), return_exceptions=True)
+        
+        if client_id in self.framing:
+            for utterance_id, _ in tasks:
+                self._send_nowait(client_id, None, utterance_id, FLAG_END | FLAG_CANCEL)
+        else:
+            self._send_nowait(client_id, {
+                "type": "cancelled",
+                "utterance_ids": [utterance_id for utterance_id, _ in tasks]
+            })
+
+    async def process_text_to_speech(self, client_id: str, text: str, utterance_id: Optional[int] = None):
         """Convert text to speech and send audio chunks to the client"""
         try:
             async for audio_chunk in tts_service.text_to_speech(text):
-                if client_id in self.active_connections:
-                    await self.send_audio_chunk(client_id, audio_chunk)
+                await self.send_audio_chunk(client_id, audio_chunk, utterance_id)
         except Exception as e:
             logger.error(f"Error in TTS processing for {client_id}: {str(e)}")
-            await self.send_error(client_id, f"TTS Error: {str(e)}")
+            await self.send_error(client_id, f"TTS Error: {str(e)}", utterance_id)
 
-    async def send_error(self, client_id: str, message: str):
-        if client_id in self.active_connections:
-            try:
-                await self.active_connections[client_id].send_json({
-                    "type": "error",
-                    "message": message
-                })
-            except Exception as e:
-                logger.error(f"Error sending error to {client_id}: {str(e)}")
+    async def process_chat_to_speech(
+        self,
+        client_id: str,
+        websocket: WebSocket,
+        chat_request: ChatRequest,
+        message: Dict[str, Any],
+        utterance_id: Optional[int] = None
+    ):
+        """Stream an Ollama reply and speak it sentence by sentence as it arrives"""
+        settings = get_settings()
+        if chat_request.keep_alive is None:
+            chat_request.keep_alive = keep_alive_for(chat_request.model)
+        try:
+            lease = await scheduler.acquire(chat_request.model, get_client_key(websocket))
+        except SchedulerFull as e:
+            await self.send_error(client_id, f"{str(e)}, retry in {e.retry_after}s", utterance_id)
+            return
+        try:
+            node = websocket.app.state.ollama_pool.checkout(chat_request.model)
+        except OllamaUnavailable as e:
+            lease.release()
+            await self.send_error(client_id, f"{str(e)}, retry in {e.retry_after}s", utterance_id)
+            return
+        pipeline = VoicePipeline(
+            client=node.client,
+            payload=chat_request.model_dump(exclude_none=True),
+            send_json=lambda data: self.send_json(client_id, data, utterance_id),
+            send_bytes=lambda chunk: self.send_audio_chunk(client_id, chunk, utterance_id),
+            voice=message.get("voice", tts_service.config.voice),
+            rate=message.get("rate", tts_service.config.rate),
+            volume=message.get("volume", tts_service.config.volume),
+            max_parallel_tts=settings.VOICE_MAX_PARALLEL_TTS,
+            min_sentence_chars=settings.VOICE_MIN_SENTENCE_CHARS
+        )
+        error = None
+        try:
+            await pipeline.run()
+        except Exception as e:
+            error = e
+            logger.error(f"Error in voice pipeline for {client_id}: {str(e)}")
+            await self.send_error(client_id, f"Chat Error: {str(e)}", utterance_id)
+        finally:
+            node.release(error)
+            lease.release()
 
 # Global connection manager
 manager = ConnectionManager()
 
+register_gauge(
+    "ws_active_connections",
+    "Open voice WebSocket connections",
+    lambda: {(): len(manager.active_connections)},
+)
+
 async def websocket_endpoint(websocket: WebSocket, client_id: str):
     """Handle WebSocket connections for voice interaction"""
     await manager.connect(websocket, client_id)
@@ -61,19 +352,59 @@ async def websocket_endpoint(websocket: WebSocket, client_id: str):
         while True:
             try:
                 # Wait for messages from the client
-                data = await websocket.receive_text()
-                message = json.loads(data)
+                received = await websocket.receive()
+                if received["type"] == "websocket.disconnect":
+                    raise WebSocketDisconnect(received.get("code", 1000))
+                if received.get("bytes") is not None:
+                    await manager.handle_frame(client_id, received["bytes"])
+                    continue
+                message = json.loads(received.get("text") or "")
                 
-                if message.get("type") == "tts":
+                if message.get("type") == "hello":
+                    # Opt in to the framed binary protocol
+                    if not manager.enable_framing(client_id, message):
+                        await manager.send_error(client_id, "Unsupported protocol, staying on JSON")
+                
+                elif message.get("type") == "tts":
                     text = message.get("text", "")
                     if text:
                         # Start TTS processing in the background
-                        asyncio.create_task(
-                            manager.process_text_to_speech(client_id, text)
+                        await manager.start_utterance(
+                            client_id,
+                            partial(manager.process_text_to_speech, client_id, text),
+                            interrupt=message.get("interrupt", True),
+                            request_id=message.get("id")
                         )
                 
+                elif message.get("type") == "chat":
+                    # Server-side pipeline: stream the LLM reply and speak it
+                    # sentence by sentence instead of waiting for the full answer
+                    try:
+                        chat_request = ChatRequest(**message)
+                    except ValidationError as e:
+                        await manager.send_error(client_id, f"Invalid chat request: {str(e)}")
+                        continue
+                    voice = message.get("voice")
+                    if voice is not None and not voice_catalog.is_valid(voice):
+                        # Fail now rather than after the LLM reply has started
+                        await manager.send_error(client_id, f"Unknown voice: {voice}")
+                        continue
+                    await manager.start_utterance(
+                        client_id,
+                        partial(manager.process_chat_to_speech, client_id, websocket, chat_request, message),
+                        interrupt=message.get("interrupt", True),
+                        request_id=message.get("id")
+                    )
+                
+                elif message.get("type") == "cancel":
+                    # Barge-in without a new request, e.g. the user hit stop
+                    stream_id = message.get("stream_id")
+                    await manager.cancel_utterances(client_id, None if stream_id is None else [stream_id])
+                
             except json.JSONDecodeError:
                 await manager.send_error(client_id, "Invalid JSON format")
+            except WebSocketDisconnect:
+                raise
             except Exception as e:
                 logger.error(f"WebSocket error for {client_id}: {str(e)}")
                 await manager.send_error(client_id, f"Server error: {str(e)}")
@@ -83,4 +414,4 @@ async def websocket_endpoint(websocket: WebSocket, client_id: str):
     except Exception as e:
         logger.error(f"Unexpected error in WebSocket: {str(e)}")
     finally:
-        manager.disconnect(client_id)
+        manager.disconnect(client_id, websocket)
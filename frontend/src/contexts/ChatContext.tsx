@@ -3,7 +3,7 @@ import type { ReactNode } from 'react';
 import { useDisclosure } from '@mantine/hooks';
 import { notifications } from '@mantine/notifications';
 import { api } from '../services/api';
-import type { Message as APIMessage } from '../services/api';
+import type { Message as APIMessage, ChatResponse, SessionChatRequest } from '../services/api';
 import { useSettings } from './SettingsContext';
 
 interface ChatMessage extends Omit<APIMessage, 'timestamp'> {
@@ -36,6 +36,10 @@ interface ChatContextType {
 
 const ChatContext = createContext<ChatContextType | undefined>(undefined);
 
+// The backend drops idle sessions; a 404 means ours has to be re-created
+const isSessionExpired = (error: any): boolean =>
+  error?.status === 404 || error?.response?.status === 404;
+
 export const ChatProvider: React.FC<{ children: ReactNode }> = ({ children }) => {
   const { settings } = useSettings();
   const [messages, setMessages] = useState<ChatMessage[]>([]);
@@ -46,6 +50,8 @@ export const ChatProvider: React.FC<{ children: ReactNode }> = ({ children }) =>
   const [isSidebarOpen, { toggle: toggleSidebar }] = useDisclosure(true);
   const [isSettingsOpen, { open: openSettings, close: closeSettings }] = useDisclosure(false);
   const abortControllerRef = useRef<AbortController | null>(null);
+  // Server-side session holding the conversation, so each turn only sends the new message
+  const sessionIdRef = useRef<string | null>(null);
 
   // Load initial data
   const loadInitialData = useCallback(async () => {
@@ -88,6 +94,47 @@ export const ChatProvider: React.FC<{ children: ReactNode }> = ({ children }) =>
     }
   }, [currentModel]);
 
+  // Get the current session, creating it seeded with the chat so far if needed
+  const ensureSession = useCallback(async (history: ChatMessage[]): Promise<string> => {
+    if (!sessionIdRef.current) {
+      const session = await api.createSession(
+        currentModel,
+        history.map(m => ({ role: m.role, content: m.content }))
+      );
+      sessionIdRef.current = session.session_id;
+    }
+    return sessionIdRef.current;
+  }, [currentModel]);
+
+  // Send one turn, re-creating the session once if the server has expired it
+  const sendTurn = useCallback(async (
+    history: ChatMessage[],
+    request: SessionChatRequest
+  ): Promise<ChatResponse> => {
+    try {
+      return await api.sessionChat(await ensureSession(history), request);
+    } catch (error) {
+      if (!isSessionExpired(error)) throw error;
+      sessionIdRef.current = null;
+      return await api.sessionChat(await ensureSession(history), request);
+    }
+  }, [ensureSession]);
+
+  const streamTurn = useCallback(async function* (
+    history: ChatMessage[],
+    request: SessionChatRequest,
+    signal: AbortSignal
+  ): AsyncGenerator<ChatResponse> {
+    try {
+      yield* api.streamSessionChat(await ensureSession(history), request, signal);
+    } catch (error) {
+      // Expiry is reported before any token is streamed, so retrying is safe
+      if (!isSessionExpired(error)) throw error;
+      sessionIdRef.current = null;
+      yield* api.streamSessionChat(await ensureSession(history), request, signal);
+    }
+  }, [ensureSession]);
+
   // Send a message to the API
   const sendMessage = useCallback(async (content: string) => {
     if (!content.trim() || isGenerating) return;
@@ -112,16 +159,10 @@ export const ChatProvider: React.FC<{ children: ReactNode }> = ({ children }) =>
     // Add messages to the chat
     setMessages(prev => [...prev, userMessage, assistantMessage]);
     
-    // Prepare the request
-    const request = {
+    // Prepare the request; the session already holds the earlier messages
+    const request: SessionChatRequest = {
       model: currentModel,
-      messages: [
-        ...messages.map(m => ({
-          role: m.role,
-          content: m.content,
-        })),
-        { role: 'user', content: content.trim() },
-      ],
+      message: { role: 'user', content: content.trim() },
       stream: settings.stream,
       temperature: settings.temperature,
       max_tokens: settings.maxTokens,
@@ -135,11 +176,11 @@ export const ChatProvider: React.FC<{ children: ReactNode }> = ({ children }) =>
         
         let fullResponse = '';
         
-        for await (const chunk of api.streamChat(request)) {
+        for await (const chunk of streamTurn(messages, request, abortControllerRef.current.signal)) {
           if (chunk.done) break;
           
-          // Update the assistant's message with the new content
-          fullResponse = chunk.message?.content || '';
+          // Ollama streams deltas, so append each token to the reply so far
+          fullResponse += chunk.message?.content || '';
           
           setMessages(prev => {
             const newMessages = [...prev];
@@ -198,7 +239,7 @@ export const ChatProvider: React.FC<{ children: ReactNode }> = ({ children }) =>
       try {
         setIsGenerating(true);
         
-        const response = await api.chat(request);
+        const response = await sendTurn(messages, request);
         
         setMessages(prev => {
           const newMessages = [...prev];
@@ -236,7 +277,7 @@ export const ChatProvider: React.FC<{ children: ReactNode }> = ({ children }) =>
         setIsGenerating(false);
       }
     }
-  }, [currentModel, isGenerating, messages, settings]);
+  }, [currentModel, isGenerating, messages, settings, sendTurn, streamTurn]);
   
   // Clear the chat
   const clearChat = useCallback(() => {
@@ -246,6 +287,12 @@ export const ChatProvider: React.FC<{ children: ReactNode }> = ({ children }) =>
       abortControllerRef.current = null;
     }
     
+    // Drop the server-side history too; the next message starts a new session
+    if (sessionIdRef.current) {
+      api.deleteSession(sessionIdRef.current).catch(() => undefined);
+      sessionIdRef.current = null;
+    }
+    
     setMessages([]);
     setIsGenerating(false);
   }, []);
@@ -255,6 +302,15 @@ export const ChatProvider: React.FC<{ children: ReactNode }> = ({ children }) =>
     loadInitialData();
   }, [loadInitialData]);
   
+  // Start loading the selected model so the first message does not wait for it
+  React.useEffect(() => {
+    if (currentModel) {
+      api.warmModel(currentModel).catch((error) => {
+        console.warn('Failed to warm up model:', error);
+      });
+    }
+  }, [currentModel]);
+  
   // Clean up on unmount
   React.useEffect(() => {
     return () => {
@@ -17,6 +17,31 @@ export interface ChatRequest {
   max_tokens?: number;
 }
 
+export interface SessionChatRequest {
+  message: Omit<Message, 'id' | 'timestamp'>;
+  model?: string;
+  stream?: boolean;
+  temperature?: number;
+  max_tokens?: number;
+}
+
+export interface Session {
+  session_id: string;
+  model: string;
+  context_tokens: number | null;
+}
+
+// Error carrying the HTTP status of a failed streaming request
+export class StreamRequestError extends Error {
+  status: number;
+
+  constructor(status: number) {
+    super(`Stream request failed with status ${status}`);
+    this.name = 'StreamRequestError';
+    this.status = status;
+  }
+}
+
 export interface ChatResponse {
   id: string;
   model: string;
@@ -92,6 +117,11 @@ class APIClient {
     return response.data;
   }
 
+  async warmModel(model: string): Promise<{ model: string; status: 'loaded' | 'loading' }> {
+    const response = await this.client.post('/models/warm', { model });
+    return response.data;
+  }
+
   // Chat
   async chat(chatRequest: ChatRequest): Promise<ChatResponse> {
     const response = await this.client.post('/chat', {
@@ -102,36 +132,8 @@ class APIClient {
   }
 
   // Stream Chat
-  async *streamChat(chatRequest: ChatRequest): AsyncGenerator<ChatResponse> {
-    const response = await this.client.post(
-      '/chat',
-      { ...chatRequest, stream: true },
-      { responseType: 'stream' }
-    );
-
-    const reader = response.data.getReader();
-    const decoder = new TextDecoder('utf-8');
-    let buffer = '';
-
-    while (true) {
-      const { done, value } = await reader.read();
-      if (done) break;
-
-      buffer += decoder.decode(value, { stream: true });
-      const lines = buffer.split('\n');
-      buffer = lines.pop() || '';
-
-      for (const line of lines) {
-        if (line.startsWith('data: ')) {
-          try {
-            const data = JSON.parse(line.slice(6));
-            yield data;
-          } catch (e) {
-            console.error('Error parsing stream data:', e);
-          }
-        }
-      }
-    }
+  async *streamChat(chatRequest: ChatRequest, signal?: AbortSignal): AsyncGenerator<ChatResponse> {
+    yield* this.streamEvents('/chat', chatRequest, signal);
   }
 
   // Generate
@@ -144,14 +146,64 @@ class APIClient {
   }
 
   // Stream Generate
-  async *streamGenerate(chatRequest: ChatRequest): AsyncGenerator<ChatResponse> {
-    const response = await this.client.post(
-      '/generate',
-      { ...chatRequest, stream: true },
-      { responseType: 'stream' }
-    );
+  async *streamGenerate(chatRequest: ChatRequest, signal?: AbortSignal): AsyncGenerator<ChatResponse> {
+    yield* this.streamEvents('/generate', chatRequest, signal);
+  }
+
+  // Sessions: the server keeps the history, so each turn only sends the new message
+  async createSession(
+    model: string,
+    messages: Omit<Message, 'id' | 'timestamp'>[] = []
+  ): Promise<Session> {
+    const response = await this.client.post('/sessions', { model, messages });
+    return response.data;
+  }
+
+  async deleteSession(sessionId: string): Promise<void> {
+    await this.client.delete(`/sessions/${sessionId}`);
+  }
+
+  async sessionChat(sessionId: string, sessionRequest: SessionChatRequest): Promise<ChatResponse> {
+    const response = await this.client.post(`/sessions/${sessionId}/chat`, {
+      ...sessionRequest,
+      stream: false,
+    });
+    return response.data;
+  }
+
+  async *streamSessionChat(
+    sessionId: string,
+    sessionRequest: SessionChatRequest,
+    signal?: AbortSignal
+  ): AsyncGenerator<ChatResponse> {
+    yield* this.streamEvents(`/sessions/${sessionId}/chat`, sessionRequest, signal);
+  }
+
+  // Read an SSE response incrementally. axios cannot expose a streamed body
+  // in the browser, so this goes through fetch and its ReadableStream.
+  private async *streamEvents(
+    path: string,
+    chatRequest: ChatRequest | SessionChatRequest,
+    signal?: AbortSignal
+  ): AsyncGenerator<ChatResponse> {
+    const headers: Record<string, string> = { 'Content-Type': 'application/json' };
+    const token = localStorage.getItem('auth_token');
+    if (token) {
+      headers.Authorization = `Bearer ${token}`;
+    }
+
+    const response = await fetch(`${this.client.defaults.baseURL}${path}`, {
+      method: 'POST',
+      headers,
+      body: JSON.stringify({ ...chatRequest, stream: true }),
+      signal,
+    });
+
+    if (!response.ok || !response.body) {
+      throw new StreamRequestError(response.status);
+    }
 
-    const reader = response.data.getReader();
+    const reader = response.body.getReader();
     const decoder = new TextDecoder('utf-8');
     let buffer = '';
 
@@ -167,9 +219,16 @@ class APIClient {
         if (line.startsWith('data: ')) {
           try {
             const data = JSON.parse(line.slice(6));
+            if (data.error) {
+              throw new Error(data.error);
+            }
             yield data;
           } catch (e) {
-            console.error('Error parsing stream data:', e);
+            if (e instanceof SyntaxError) {
+              console.error('Error parsing stream data:', e);
+            } else {
+              throw e;
+            }
           }
         }
       }